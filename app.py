@@ -1,19 +1,29 @@
+import argparse
 import json
 import logging
 import os
 import sys
 import threading
+import time
 import tkinter as tk
 from PIL import Image
 import pystray
 
+from capture_backend import CAPTURE_MODE_CURSOR, create_capture_backend, enable_dpi_awareness
 from hotkey_manager import hotkey_manager
 from log_handler import setup_logging
 from main_ui import MainUI
-from ocr_tool import (perform_ocr_on_image, setup_ocr_manager,
-                      shutdown_ocr_manager)
-from screenshot_tool import Screenshotter
+from memory_trace import MemoryTracer, process_memory
+from metrics import metrics
+from ocr_client import SpeculativeOcr
+from ocr_tool import ocr_client, perform_ocr_on_files, perform_ocr_on_image, perform_ocr_on_images
+from screenshot_tool import DEFAULT_MEMORY_BUDGET_MB, REGION_ORDER_SELECTION, Screenshotter
+from session_trace import TraceRecorder
+from postprocess import PostprocessOptions, TextPostprocessor
+from preprocess import PreprocessOptions
+from profiler import SamplingProfiler
 from settings_page import SettingsPage
+from single_instance import SingleInstance
 
 
 def get_resource_path(relative_path):
@@ -32,7 +42,8 @@ CONFIG_FILE = get_resource_path("config.json")
 ICON_FILE = get_resource_path("icon.ico")
 
 class Application:
-    def __init__(self):
+    def __init__(self, instance=None):
+        self.instance = instance
         self.main_ui = MainUI()
         self.logger = setup_logging(self.main_ui.log)
         
@@ -41,21 +52,54 @@ class Application:
         self.tray_icon = None
         self.screenshot_after_id = None
         self.active_screenshotter = None
+        self.capture_backend = create_capture_backend(tk_root=self.main_ui)
+        self.trace_recorder = None
+        self.profiler = SamplingProfiler()
+        self.profiler.on_finished = self._on_profile_finished
+        metrics.register_gauge("process.memory", process_memory)
+        ocr_client.supervisor.register_gauges()
 
         # 将设置页面嵌入到主UI中
-        self.settings_page = SettingsPage(self.main_ui.settings_frame, CONFIG_FILE, self.logger, on_save_callback=self.apply_new_hotkey)
+        self.settings_page = SettingsPage(self.main_ui.settings_frame, CONFIG_FILE, self.logger,
+                                          on_save_callback=self.apply_new_settings,
+                                          on_profile_callback=self.toggle_profiling)
         self.settings_page.pack(expand=True, fill="both")
 
-    def apply_new_hotkey(self, new_hotkey):
-        """应用新的热键配置"""
+    def apply_new_settings(self, new_hotkey):
+        """应用新的配置：重新注册热键，引擎路径变化时在后台热切换OCR引擎"""
         logging.info(f"接收到新的热键配置: {new_hotkey}")
         # 重新加载配置以确保所有设置都是最新的
         self.load_config()
         self.config['hotkey'] = new_hotkey # 确保内存中的配置也更新
-        
+
+        # 引擎在切换完成前继续服务，期间的截图会排队等待新引擎
+        if not ocr_client.configure(self.config.get("ocr_engine_path", ""), self.config.get("engine_lib_path", "")):
+            logging.error("无法启动外部OCR引擎，请检查配置路径。")
+            self.main_ui.after(0, self.main_ui.update_status, "OCR启动失败", "red")
+            return
+
         hotkey_manager.reregister_hotkeys(new_hotkey, self.trigger_screenshot)
+        self.is_service_running = True
+        self.main_ui.after(0, self.main_ui.update_status, "运行中", "green")
         self.main_ui.show_toast(f"热键已更新为: {new_hotkey}")
 
+    def toggle_profiling(self, enabled, captures=None, seconds=None):
+        """开始或提前结束性能剖析，结果写入程序目录下的 profile_<时间>.prof / .speedscope.json"""
+        if not enabled:
+            self.profiler.stop()
+            return
+        output_base = get_resource_path(time.strftime("profile_%Y%m%d_%H%M%S"))
+        if self.profiler.start(output_base, seconds=seconds, captures=captures):
+            self.settings_page.profile_var.set(True)
+
+    def _on_profile_finished(self, paths):
+        # 在采样线程中调用，切回UI线程更新界面
+        def update_ui():
+            self.settings_page.profile_var.set(False)
+            if paths:
+                self.main_ui.show_toast(f"性能剖析已保存:\n{os.path.basename(paths[0])}")
+        self.main_ui.after(0, update_ui)
+
     def initialize_services(self):
         """加载配置、启动OCR和注册热键"""
         # 首次运行的特殊处理
@@ -70,6 +114,19 @@ class Application:
                 "engine_lib_path": self.settings_page.engine_lib_path_var.get(),
                 "hotkey": "ctrl+alt+q",
                 "screenshot_delay": 0.15,
+                "capture_mode": CAPTURE_MODE_CURSOR,
+                "click_select": True,
+                "region_order": REGION_ORDER_SELECTION,
+                "speculative_ocr": False,
+                "speculative_pause_ms": 300,
+                "ocr_trim_margins": True,
+                "ocr_rescale": True,
+                "ocr_grayscale": False,
+                "text_halfwidth": True,
+                "text_halfwidth_punctuation": False,
+                "text_merge_hyphens": False,
+                "text_cjk_spacing": False,
+                "text_rules": [],
                 "verbose_log": False
             }
             try:
@@ -79,6 +136,7 @@ class Application:
                 # 更新UI上的显示
                 self.settings_page.hotkey_var.set(default_config["hotkey"])
                 self.settings_page.delay_var.set(default_config["screenshot_delay"])
+                self.settings_page.capture_all_var.set(False)
                 self.settings_page.verbose_log_var.set(default_config["verbose_log"])
             except Exception as e:
                 logging.error(f"创建默认配置文件失败: {e}")
@@ -93,8 +151,14 @@ class Application:
         # 应用日志级别设置
         self.logger.set_verbose(self.config.get("verbose_log", False))
 
+        # 可选：录制截图会话，供 session_trace.py 回放
+        trace_path = self.config.get("trace_record_path", "")
+        if trace_path:
+            self.trace_recorder = TraceRecorder(trace_path)
+            logging.info(f"会话录制已开启: {trace_path}")
+
         logging.debug("正在初始化OCR服务...")
-        if not setup_ocr_manager(self.config.get("ocr_engine_path", ""), self.config.get("engine_lib_path", "")):
+        if not ocr_client.start(self.config.get("ocr_engine_path", ""), self.config.get("engine_lib_path", "")):
             logging.error("无法启动外部OCR引擎，请检查配置路径。")
             self.main_ui.update_status("OCR启动失败", "red")
             self.main_ui.show_window()
@@ -125,16 +189,24 @@ class Application:
                 with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
                     json.dump({}, f)
                 self.config = {}
+                self._configure_client()
                 return True
             
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
                 self.config = json.load(f)
+            self._configure_client()
             return True
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logging.error(f"加载或创建配置失败: {e}")
             self.config = {}
             return False
 
+    def _configure_client(self):
+        """按配置设置 ocr_client 的预处理选项，并编译文本后处理规则"""
+        ocr_client.preprocess = PreprocessOptions.from_config(self.config)
+        options = PostprocessOptions.from_config(self.config)
+        ocr_client.postprocess = TextPostprocessor(options) if options.enabled() else None
+
     def is_config_valid(self):
         required_keys = ["ocr_engine_path", "engine_lib_path", "hotkey"]
         return self.config and all(key in self.config and self.config[key] for key in required_keys)
@@ -158,31 +230,80 @@ class Application:
             self.active_screenshotter.destroy()
 
         logging.debug("正式开始截图流程...")
-        self.active_screenshotter = Screenshotter(self.main_ui)
-        image = self.active_screenshotter.capture()
+        capture_mode = self.config.get("capture_mode", CAPTURE_MODE_CURSOR)
+        memory_budget_mb = self.config.get("capture_memory_budget_mb", DEFAULT_MEMORY_BUDGET_MB)
+        tracer = MemoryTracer(enabled=self.config.get("memory_debug", False))
+        speculator = None
+        if self.config.get("speculative_ocr", False):
+            speculator = SpeculativeOcr(ocr_client, pause_ms=self.config.get("speculative_pause_ms", 300))
+        self.active_screenshotter = Screenshotter(self.main_ui, self.capture_backend, capture_mode,
+                                                  memory_budget_mb=memory_budget_mb, tracer=tracer,
+                                                  click_select=self.config.get("click_select", True),
+                                                  region_order=self.config.get("region_order", REGION_ORDER_SELECTION),
+                                                  speculator=speculator)
+        regions = self.active_screenshotter.capture()
         self.active_screenshotter = None
 
-        if image:
-            logging.info("截图成功，提交OCR任务...")
-            threading.Thread(target=perform_ocr_on_image, args=(image,), daemon=True).start()
+        if regions:
+            metrics.mark("captures")
+            logging.info(f"截图成功，提交 {len(regions)} 个OCR任务...")
+            threading.Thread(target=self._run_ocr, args=(regions, time.monotonic(), speculator), daemon=True).start()
         else:
+            # 没有选区（取消，或拖动后缩回到很小再松开）时放弃所有推测任务，否则其临时文件和计数会一直残留
+            if speculator:
+                speculator.close()
             logging.info("截图已取消。")
 
+    def _run_ocr(self, regions, captured_at, speculator=None):
+        """在后台线程中执行OCR，多个选区同时识别；开启录制时同时记录本次截图"""
+        ocr_start = time.perf_counter()
+        boxes, images = [box for box, _ in regions], [image for _, image in regions]
+        if len(images) == 1 and not speculator:
+            texts = [perform_ocr_on_image(images[0])]
+        else:
+            texts = perform_ocr_on_images(images, boxes=boxes, speculator=speculator)
+        if self.trace_recorder:
+            latency = time.perf_counter() - ocr_start
+            for box, image, ocr_text in zip(boxes, images, texts):
+                speculative = (box in speculator.hit_boxes) if speculator else None
+                self.trace_recorder.record(image, captured_at, ocr_text, latency, speculative)
+        self.profiler.note_capture()
+
     def shutdown(self):
         logging.info("正在关闭应用程序...")
         if self.tray_icon:
             self.tray_icon.stop()
         
+        self.profiler.stop()
+        if self.instance:
+            self.instance.close()
         if self.is_service_running:
             hotkey_manager.stop()
-            shutdown_ocr_manager()
+            ocr_client.close()
         
         self.logger.stop()
         self.main_ui.quit()
         logging.info("应用程序已退出。")
 
-    def run(self):
+    def handle_command(self, command, args):
+        """处理命令行请求，或其他实例转发过来的请求"""
+        if command == "show":
+            self.main_ui.after(0, self.main_ui.show_window)
+        elif command == "capture":
+            self.main_ui.after(0, self.trigger_screenshot)
+        elif command == "ocr":
+            threading.Thread(target=perform_ocr_on_files, args=(args,), daemon=True).start()
+        elif command == "profile":
+            seconds, captures = args
+            self.main_ui.after(0, lambda: self.toggle_profiling(True, captures=captures, seconds=seconds))
+
+    def run(self, requests=()):
         self.initialize_services()
+        if self.instance:
+            self.instance.serve(self.handle_command)
+        for command, args in requests:
+            if command != "show":
+                self.handle_command(command, args)
         
         # 创建系统托盘图标
         icon_image = Image.open(ICON_FILE)
@@ -207,6 +328,40 @@ class Application:
         else:
             self.main_ui.hide_window()
 
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Ocr2Clip - 截图OCR到剪贴板")
+    parser.add_argument("--profile-seconds", type=float, help="启动后记录性能剖析的时长(秒)")
+    parser.add_argument("--profile-captures", type=int, help="启动后对接下来N次截图记录性能剖析")
+    parser.add_argument("--capture", action="store_true", help="立即开始截图")
+    parser.add_argument("--show", action="store_true", help="显示控制面板")
+    parser.add_argument("files", nargs="*", help="对这些图片文件执行OCR并复制结果")
+    return parser.parse_args(argv)
+
+
+def build_requests(args):
+    """把命令行参数转换为 [(命令, 参数)]，性能剖析在最前；既没有指定操作也没有指定性能剖析时为显示窗口"""
+    requests = []
+    if args.profile_seconds or args.profile_captures:
+        requests.append(("profile", [args.profile_seconds, args.profile_captures]))
+    if args.files:
+        requests.append(("ocr", [os.path.abspath(path) for path in args.files]))
+    elif args.capture:
+        requests.append(("capture", []))
+    elif args.show or not requests:
+        requests.append(("show", []))
+    return requests
+
+
 if __name__ == "__main__":
-    app = Application()
-    app.run()
+    # 必须在创建任何窗口之前声明，之后显示器、鼠标和窗口坐标都与截图一样是物理像素
+    enable_dpi_awareness()
+    args = parse_args()
+    requests = build_requests(args)
+
+    # 已有实例在运行时，把请求（包括性能剖析）转发给它后立即退出，避免启动第二个OCR引擎和重复注册热键
+    instance = SingleInstance()
+    if not instance.acquire():
+        sys.exit(0 if all([instance.forward(*request) for request in requests]) else 1)
+
+    app = Application(instance)
+    app.run(requests)
@@ -0,0 +1,610 @@
+"""性能基准脚本，基于伪后端运行，不依赖 Windows 环境
+
+用法: python benchmark.py {capture,client,detect,idle,memory,postprocess,preprocess,regions,speculative,taskid} [--repeat N]
+"""
+import argparse
+import gc
+import os
+import re
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+from PIL import Image, ImageDraw
+
+from capture_backend import (CAPTURE_MODE_ALL, CAPTURE_MODE_CURSOR,
+                             FakeCaptureBackend, Monitor, PilCaptureBackend, enable_dpi_awareness)
+from memory_trace import MemoryTracer, peak_process_memory, process_memory, reset_peak_memory
+from ocr_engine import (OCR_MAX_TASK_ID, ConnectState, EngineSupervisor, FakeEngine,
+                        TaskIdPool, TaskPathMap)
+from ocr_client import OcrClient, SpeculativeOcr
+from postprocess import PostprocessOptions, TextPostprocessor
+from preprocess import PreprocessOptions, preprocess_image
+from region_detect import detect_text_blocks
+from screenshot_tool import (Screenshotter, estimate_capture_bytes, grab_monitors, overlay_window_geometry,
+                             prepare_overlay_background, select_monitors_within_budget)
+
+
+def _timeit(func, repeat):
+    """运行 repeat 次，返回 (平均耗时ms, 最短耗时ms)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sum(timings) / len(timings), min(timings)
+
+
+def bench_capture(args):
+    """对比仅截取鼠标所在显示器与截取全部显示器的开销（截图 + 变暗背景）
+
+    先在合成的三显示器桌面上用伪后端运行；有显示环境时再用真实后端截取本机的显示器。
+    """
+    monitors = [
+        Monitor(0, 0, 3840, 2160, scale=1.5, name="4K"),
+        Monitor(3840, 0, 2560, 1440, scale=1.0, name="QHD"),
+        Monitor(-1920, 0, 1920, 1080, scale=1.0, name="FHD"),
+    ]
+    for mode in (CAPTURE_MODE_CURSOR, CAPTURE_MODE_ALL):
+        _bench_capture_mode("fake", FakeCaptureBackend(monitors, cursor=(4000, 100)), mode, args.repeat)
+    _check_overlay_placement(monitors)
+
+    enable_dpi_awareness()
+    backend = PilCaptureBackend()
+    try:
+        backend.grab(backend.monitor_at_cursor())
+    except Exception as e:  # 没有显示环境（例如 CI 或无桌面的 Linux）
+        print(f"real backend skipped: {e}")
+        return
+    print(f"real monitors: {backend.monitors()}")
+    for mode in (CAPTURE_MODE_CURSOR, CAPTURE_MODE_ALL):
+        _bench_capture_mode("real", backend, mode, args.repeat)
+
+
+def _bench_capture_mode(label, backend, mode, repeat):
+    selected = backend.select_monitors(mode)
+
+    def run():
+        for monitor in selected:
+            image = backend.grab(monitor)
+            prepare_overlay_background(image, monitor.overlay_geometry()[2:])
+
+    mean_ms, best_ms = _timeit(run, repeat)
+    pixels = sum(monitor.width * monitor.height for monitor in selected)
+    print(f"capture {label:<4} mode={mode:<6} pixels/press={pixels:>10,} mean={mean_ms:7.1f}ms best={best_ms:7.1f}ms")
+
+
+def _check_overlay_placement(monitors):
+    """检查每个显示器（包括坐标为负的显示器）的覆盖窗口位置
+
+    先按 Tk 的规则解析 geometry 字符串；有显示环境时再为每个显示器打开覆盖窗口，核对窗口的实际位置。
+    """
+    failed = []
+    for monitor in monitors:
+        geometry = overlay_window_geometry(monitor)
+        match = re.fullmatch(r"(\d+)x(\d+)\+(-?\d+)\+(-?\d+)", geometry)
+        if not match or tuple(map(int, match.groups())) != (monitor.width, monitor.height, monitor.x, monitor.y):
+            failed.append(f"{monitor.name}: {geometry}")
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError as e:  # 没有显示环境
+        print(f"overlay placement: geometry ok={not failed}, windows skipped: {e}")
+    else:
+        screenshotter = Screenshotter(root, FakeCaptureBackend(monitors), CAPTURE_MODE_ALL, memory_budget_mb=2048)
+        root.update_idletasks()
+        for overlay in screenshotter.overlays:
+            position = (overlay.win.winfo_rootx(), overlay.win.winfo_rooty())
+            if position != (overlay.monitor.x, overlay.monitor.y):
+                failed.append(f"{overlay.monitor.name}: window at {position}")
+        print(f"overlay placement: {len(screenshotter.overlays)} windows checked")
+        screenshotter.destroy()
+        root.destroy()
+    if failed:
+        print(f"FAIL: 覆盖窗口位置错误: {'; '.join(failed)}")
+        sys.exit(1)
+
+
+def bench_memory(args):
+    """在合成的 8K + 双 4K 桌面上走一遍截图流程（截图、变暗背景、裁剪选区），检查进程内存峰值不超过预算
+
+    有显示环境时直接运行 Screenshotter 并用鼠标事件框选；否则调用 Screenshotter 的截图和背景函数，用同尺寸的
+    PIL 图像代替 Tk 持有的像素。伪后端与 BitBlt 一样分配中间缓冲区，峰值取自进程的内存高水位，包括阶段之间
+    短暂存在的缓冲区。
+    """
+    monitors = [
+        Monitor(0, 0, 7680, 4320, scale=2.0, name="8K"),
+        Monitor(7680, 0, 3840, 2160, scale=1.0, name="4K-1"),
+        Monitor(-3840, 0, 3840, 2160, scale=1.0, name="4K-2"),
+    ]
+    budget = args.budget_mb * 2**20
+    box = (100, 100, 1700, 900)  # 覆盖窗口坐标中的选区
+    backend = FakeCaptureBackend(monitors, cursor=(100, 100))
+    selected = select_monitors_within_budget(backend.select_monitors(CAPTURE_MODE_ALL), budget, backend)
+    try:
+        root = tk.Tk()
+        root.withdraw()
+    except tk.TclError:  # 没有显示环境
+        root = None
+
+    tracer = MemoryTracer(enabled=True)
+    gc.collect()
+    baseline = process_memory()
+    reset_peak_memory()
+    if root:
+        _memory_run_screenshotter(root, backend, args.budget_mb, tracer, box)
+        root.destroy()
+    else:
+        _memory_run_steps(backend, args.budget_mb, tracer, box)
+
+    peak_growth = (peak_process_memory() or tracer.peak_rss()) - baseline
+    released = tracer.stages[-1][3] - baseline
+    print(f"path={'screenshotter' if root else 'steps'} monitors={len(selected)}/{len(monitors)} "
+          f"estimate={estimate_capture_bytes(selected, backend) / 2**20:.0f}MB "
+          f"peak_growth={peak_growth / 2**20:.0f}MB after_destroy={released / 2**20:.0f}MB "
+          f"budget={args.budget_mb}MB")
+    if peak_growth > budget:
+        print("FAIL: 内存峰值超过预算")
+        sys.exit(1)
+
+
+def _memory_run_screenshotter(root, backend, budget_mb, tracer, box):
+    """打开真实的覆盖窗口，在第一个显示器上用鼠标事件拖出 box 后松开"""
+    screenshotter = Screenshotter(root, backend, CAPTURE_MODE_ALL, memory_budget_mb=budget_mb, tracer=tracer)
+
+    def drag():
+        win = screenshotter.overlays[0].win
+        left, top, right, bottom = box
+        win.event_generate("<ButtonPress-1>", x=left, y=top)
+        for step in range(1, 21):
+            win.event_generate("<Motion>", x=left + (right - left) * step // 20, y=top + (bottom - top) * step // 20,
+                               state=0x100)  # Button1 按下
+        win.event_generate("<ButtonRelease-1>", x=right, y=bottom)
+
+    screenshotter.win.after(0, drag)
+    return screenshotter.capture()
+
+
+def _memory_run_steps(backend, budget_mb, tracer, box):
+    """没有显示环境时的替代流程
+
+    截图直接调用 Screenshotter 使用的 grab_monitors 和 prepare_overlay_background，
+    只把 Tk 持有的像素（背景 PhotoImage 和拖动时的选区 PhotoImage）换成同尺寸的 PIL 图像。
+    """
+    tracer.start()
+    held = []
+    for monitor, image in grab_monitors(backend, CAPTURE_MODE_ALL, budget_mb, tracer):
+        background = prepare_overlay_background(image, monitor.overlay_geometry()[2:])
+        held.append((monitor, image, background.copy()))
+        del background
+        tracer.snapshot("overlay")
+    image = None
+    monitor, image, _ = held[0]
+    logical_size = monitor.overlay_geometry()[2:]
+    selection_photo = Image.new("RGB", logical_size)
+    crop = image.crop(monitor.to_physical(box, logical_size))
+    selection_photo.paste(crop)
+    tracer.snapshot("crop")
+    image = selection_photo = None
+    held.clear()
+    tracer.snapshot("destroy")
+    tracer.stop()
+    return crop
+
+
+def _text_mask(lines, font_scale):
+    """白字黑底的文字掩码，返回 (掩码, 单行文字高度)"""
+    mask = Image.new("L", (220, 14 * lines))
+    draw = ImageDraw.Draw(mask)
+    for i in range(lines):
+        draw.text((0, i * 14), "The quick brown fox 0123456789", fill=255)
+    top, bottom = draw.textbbox((0, 0), "The quick brown fox 0123456789")[1::2]
+    if font_scale != 1:
+        mask = mask.resize((mask.width * font_scale, mask.height * font_scale))
+    return mask, (bottom - top) * font_scale
+
+
+def _synthetic_text_crops():
+    """模拟用户宽松框选的截图，返回 [(名称, 图像, 文字行高)]
+
+    大面积背景中的一小块文字：纯色背景（包括极小字号和高 DPI 大字号），以及带标题栏、渐变、噪点的背景和抖动后的
+    调色板、黑白图像。
+    """
+    crops = []
+    for name, size, font_scale, lines in (("flat", (1200, 800), 1, 3), ("flat-1line", (900, 300), 1, 1),
+                                          ("flat-hidpi", (1600, 1000), 6, 2), ("titlebar", (1200, 800), 1, 10),
+                                          ("gradient", (1200, 800), 1, 10), ("noise", (1200, 800), 1, 10),
+                                          ("palette", (1200, 800), 1, 10), ("bilevel", (1200, 800), 1, 10)):
+        if name in ("gradient", "palette", "bilevel"):
+            ramp = Image.linear_gradient("L").resize(size)
+            image = Image.merge("RGB", (ramp.point(lambda v: 120 + v // 2), ramp.point(lambda v: 180 + v // 4),
+                                        Image.new("L", size, 240)))
+        elif name == "noise":
+            image = Image.merge("RGB", [Image.effect_noise(size, 40).point(lambda v: 160 + v // 3)] * 3)
+        elif name == "titlebar":  # 深色主题窗口，顶部是蓝色标题栏
+            image = Image.new("RGB", size, (32, 32, 32))
+            image.paste((0, 120, 215), (0, 0, size[0], 60))
+        else:
+            image = Image.new("RGB", size, (250, 250, 250))
+        mask, line_height = _text_mask(lines, font_scale)
+        ink = (220, 220, 220) if name == "titlebar" else (20, 20, 20)
+        image.paste(ink, (size[0] // 4, size[1] // 3), mask)
+        if name == "palette":
+            image = image.convert("P", palette=Image.Palette.WEB, dither=Image.Dither.FLOYDSTEINBERG)
+        elif name == "bilevel":
+            image = image.convert("1")
+        crops.append((name, image, line_height))
+    return crops
+
+
+def _synthetic_crops():
+    return [image for _, image, _ in _synthetic_text_crops()]
+
+
+def _temp_factory(latency, latency_per_mpx):
+    def factory(exe_path, lib_dir, on_connect_change):
+        return FakeEngine(lib_dir, on_connect_change, latency=latency, startup=0, latency_per_mpx=latency_per_mpx)
+    return factory
+
+
+def bench_preprocess(args):
+    """对比启用预处理前后发送给引擎的像素数和端到端耗时（伪引擎耗时与像素数成正比）
+
+    同时检查每张截图缩放后的文字行高：不能被缩小到原字号和 min_line_height 以下，也不能被放大到原字号和
+    max_line_height 以上。
+    """
+    text_crops = _synthetic_text_crops()
+    crops = [image for _, image, _ in text_crops]
+    options = PreprocessOptions()
+    failed = []
+    for name, crop, line_height in text_crops:
+        image, transform = preprocess_image(crop, options)
+        scaled = line_height * transform.scale
+        print(f"  {name:<10} {crop.mode:<3} {crop.width}x{crop.height} -> {image.width}x{image.height} "
+              f"scale={transform.scale:.2f} line_height={line_height}->{scaled:.0f}")
+        if not min(line_height, options.min_line_height) <= scaled <= max(line_height, options.max_line_height):
+            failed.append(name)
+
+    client = OcrClient(supervisor=EngineSupervisor(_temp_factory(0.02, 0.08)), temp_dir=tempfile.mkdtemp())
+    client.start("", "")
+    try:
+        for label, current in (("off", None), ("on", options)):
+            pixels = 0
+            for crop in crops:
+                image = preprocess_image(crop, current)[0] if current else crop
+                pixels += image.width * image.height
+
+            client.preprocess = current
+
+            def run():
+                for crop in crops:
+                    client.ocr(crop)
+
+            mean_ms, best_ms = _timeit(run, args.repeat)
+            print(f"preprocess={label:<3} pixels_sent={pixels:>10,} end_to_end mean={mean_ms:7.1f}ms "
+                  f"best={best_ms:7.1f}ms ({len(crops)} crops)")
+    finally:
+        client.close()
+    if failed:
+        print(f"FAIL: 文字行高被缩放到合理范围之外: {', '.join(failed)}")
+        sys.exit(1)
+
+
+def bench_regions(args):
+    """多选区识别：对比逐个识别与同时提交的端到端耗时，同时提交应接近单个选区的耗时"""
+    from ocr_tool import perform_ocr_on_image, perform_ocr_on_images
+
+    # 只用纯色背景的截图，最后一张（高 DPI 大字号）最大，作为单个选区的基准
+    crops = [image for name, image, _ in _synthetic_text_crops() if name.startswith("flat")] * 2
+    client = OcrClient(supervisor=EngineSupervisor(_temp_factory(0.1, 0.02)), temp_dir=tempfile.mkdtemp())
+    client.start("", "")
+    try:
+        single_ms, _ = _timeit(lambda: perform_ocr_on_image(crops[-1], copy_to_clipboard=False, client=client),
+                               args.repeat)
+
+        def sequential():
+            for crop in crops:
+                perform_ocr_on_image(crop, copy_to_clipboard=False, client=client)
+
+        def concurrent():
+            perform_ocr_on_images(crops, copy_to_clipboard=False, client=client)
+
+        print(f"slowest single region: {single_ms:7.1f}ms")
+        for label, func in (("sequential", sequential), ("concurrent", concurrent)):
+            mean_ms, best_ms = _timeit(func, args.repeat)
+            print(f"{label:<10} {len(crops)} regions: mean={mean_ms:7.1f}ms best={best_ms:7.1f}ms "
+                  f"({mean_ms / single_ms:.1f}x single)")
+    finally:
+        client.close()
+
+
+def bench_speculative(args):
+    """推测识别：拖动停顿时提交选区，继续拖动 --drag-ms 后松开，对比松开到拿到文本的耗时"""
+    from metrics import metrics
+    from ocr_tool import perform_ocr_on_images
+
+    screen = _synthetic_screen()
+    final = (600, 150, 1500, 300)
+    cases = (("off", None), ("hit", (590, 140, 1510, 310)), ("miss", (0, 0, 400, 300)))
+    client = OcrClient(supervisor=EngineSupervisor(_temp_factory(0.15, 0.05)), temp_dir=tempfile.mkdtemp())
+    client.start("", "")
+    try:
+        for label, speculated in cases:
+            timings = []
+            for _ in range(args.repeat):
+                speculator = SpeculativeOcr(client) if speculated else None
+                if speculator:
+                    speculator.speculate(speculated, screen.crop(speculated))
+                time.sleep(args.drag_ms / 1000)  # 停顿之后用户继续拖动，直到松开鼠标
+                start = time.perf_counter()
+                perform_ocr_on_images([screen.crop(final)], copy_to_clipboard=False, client=client,
+                                      boxes=[final], speculator=speculator)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"speculative={label:<4} release->text mean={sum(timings) / len(timings):7.1f}ms "
+                  f"best={min(timings):7.1f}ms (drag after pause: {args.drag_ms}ms)")
+        hit_rate = metrics.hit_rate("cache")
+        print(f"cache hit rate: {'-' if hit_rate is None else f'{hit_rate:.0%}'}")
+    finally:
+        client.close()
+
+
+def bench_client(args):
+    """OcrClient 的三种接口：逐个 ocr()、map() 流式返回、asyncio.gather 多个 aocr()
+
+    map() 的首个结果应在最快的一张完成时就返回，aocr() 并发时总耗时应与 map() 相当。
+    """
+    import asyncio
+
+    # 各图像尺寸不同，伪引擎耗时随像素数增加，完成顺序与输入顺序不同
+    crops = sorted(_synthetic_crops(), key=lambda crop: -crop.width * crop.height)
+    client = OcrClient(supervisor=EngineSupervisor(_temp_factory(0.05, 0.1)), temp_dir=tempfile.mkdtemp())
+    client.start("", "")
+    try:
+        def sequential():
+            return [client.ocr(crop) for crop in crops]
+
+        def streamed():
+            start = time.perf_counter()
+            first_ms = None
+            results = []
+            for result in client.map(crops):
+                if first_ms is None:
+                    first_ms = (time.perf_counter() - start) * 1000
+                results.append(result)
+            streamed.first.append(first_ms)
+            streamed.order = [result.index for result in results]
+            return results
+        streamed.first = []
+
+        async def gather():
+            return await asyncio.gather(*(client.aocr(crop) for crop in crops))
+
+        for label, func in (("ocr", sequential), ("map", streamed), ("aocr", lambda: asyncio.run(gather()))):
+            failed = sum(1 for result in func() if not result.ok)
+            mean_ms, best_ms = _timeit(func, args.repeat)
+            print(f"{label:<4} {len(crops)} images: mean={mean_ms:7.1f}ms best={best_ms:7.1f}ms failed={failed}")
+        print(f"map first result: mean={sum(streamed.first) / len(streamed.first):7.1f}ms "
+              f"completion order={streamed.order}")
+
+        # 超过引擎任务ID数量的一批图像：所有任务都应完成，不能有任务因等不到空闲ID而超时
+        burst = [Image.new("RGB", (64, 32), (255, 255, 255))] * (OCR_MAX_TASK_ID + 8)
+        start = time.perf_counter()
+        failed = sum(1 for result in client.map(burst) if not result.ok)
+        print(f"map  {len(burst)} images (> {OCR_MAX_TASK_ID} task ids): "
+              f"{(time.perf_counter() - start) * 1000:7.1f}ms failed={failed}")
+    finally:
+        client.close()
+    if failed:
+        print("FAIL: 超过任务ID数量的批量识别有任务失败")
+        sys.exit(1)
+
+
+def _dispatch_cycle(ids, paths, state, tasks, cross_thread):
+    """模拟 tasks 次派发：检查连接、取ID、记录路径，由回调（同线程或另一线程）删除路径并归还ID"""
+    import queue
+    import threading
+
+    def complete(task_id):
+        paths.get(task_id)
+        paths.pop(task_id, None)
+        ids.put(task_id)
+
+    completed = queue.SimpleQueue()
+    worker = None
+    if cross_thread:
+        def run():
+            while (task_id := completed.get()) is not None:
+                complete(task_id)
+        worker = threading.Thread(target=run)
+        worker.start()
+    for i in range(tasks):
+        assert state.value
+        task_id = ids.get(timeout=1)
+        paths[task_id] = f"temp_{i}.png"
+        if worker:
+            completed.put(task_id)
+        else:
+            complete(task_id)
+    if worker:
+        completed.put(None)
+        worker.join()
+
+
+def bench_taskid(args):
+    """对比原实现（multiprocessing 的 Queue/Value + 普通字典）与进程内分配器的单任务派发开销"""
+    from multiprocessing import Queue, Value
+
+    tasks = 2000
+
+    def legacy():
+        ids, state = Queue(OCR_MAX_TASK_ID), Value('b', True)
+        for i in range(1, OCR_MAX_TASK_ID + 1):
+            ids.put(i)
+        return ids, {}, state
+
+    def native():
+        state = ConnectState()
+        state.value = True
+        return TaskIdPool(range(1, OCR_MAX_TASK_ID + 1)), TaskPathMap(), state
+
+    for cross_thread in (False, True):
+        for label, factory in (("mp.Queue", legacy), ("TaskIdPool", native)):
+            parts = factory()
+            mean_ms, best_ms = _timeit(lambda: _dispatch_cycle(*parts, tasks, cross_thread), args.repeat)
+            where = "callback thread" if cross_thread else "same thread"
+            print(f"{label:<10} ({where:<15}): {mean_ms * 1000 / tasks:6.2f}us/task mean, "
+                  f"{best_ms * 1000 / tasks:6.2f}us/task best")
+
+
+def bench_postprocess(args):
+    """文本后处理吞吐量：逐条 str.translate / re.sub 与编译后的 TextPostprocessor 对比（MB/s）"""
+    import re
+
+    options = PostprocessOptions(halfwidth=True, merge_hyphens=True, cjk_spacing=True,
+                                 rules=[(r"\bteh\b", "the"), (r"colour", "color"), (r"(\d+)\s*%", r"\1%")])
+    mixed = ("识别结果ＯＣＲ２０２４年的 colour 测试，exam-\nple 文本 teh quick fox 中文English混排 "
+             "５０ % 完成\n")
+    english = "The quick brown fox jumps over teh lazy dog, 50 % of the colour is gone.\n"
+
+    table = str.maketrans({chr(code): chr(code - 0xFEE0) for start, end in
+                           ((0xFF10, 0xFF19), (0xFF21, 0xFF3A), (0xFF41, 0xFF5A)) for code in range(start, end + 1)})
+    table[0x3000] = " "
+    cjk = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+    regexes = [(r"(?<=[A-Za-z])-\n(?=[a-z])", ""), (rf"(?<=[{cjk}])(?=[A-Za-z0-9])", " "),
+               (rf"(?<=[A-Za-z0-9])(?=[{cjk}])", " ")] + options.rules
+
+    def naive(text):
+        text = text.translate(table)
+        for pattern, replacement in regexes:
+            text = re.sub(pattern, replacement, text)
+        return text
+
+    processor = TextPostprocessor(options)
+    for label, sample in (("mixed", mixed), ("english", english)):
+        results = [sample * 20] * 500  # 一次批量识别的 500 条结果
+        size_mb = sum(len(text.encode("utf-8")) for text in results) / 2**20
+        if naive(results[0]) != processor(results[0]):
+            print("WARNING: 两种实现的输出不一致")
+        for name, func in (("naive", naive), ("compiled", processor)):
+            mean_ms, best_ms = _timeit(lambda: [func(text) for text in results], args.repeat)
+            print(f"{label:<8} {name:<8} {size_mb / (mean_ms / 1000):7.1f} MB/s mean "
+                  f"{size_mb / (best_ms / 1000):7.1f} MB/s best ({size_mb:.1f} MB in {len(results)} results)")
+
+
+def _synthetic_screen(size=(3840, 2160)):
+    """模拟 4K 桌面：标题栏、侧边栏和若干段落文字"""
+    image = Image.new("RGB", size, (245, 245, 245))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, size[0], 60), fill=(40, 60, 90))
+    draw.text((20, 24), "Ocr2Clip - synthetic desktop", fill=(255, 255, 255))
+    draw.rectangle((0, 60, 400, size[1]), fill=(225, 228, 232))
+    for i in range(20):
+        draw.text((30, 100 + i * 40), f"Sidebar item {i}", fill=(30, 30, 30))
+    for column in range(2):
+        for paragraph in range(5):
+            left, top = 600 + column * 1600, 160 + paragraph * 380
+            for line in range(6):
+                draw.text((left, top + line * 18), "The quick brown fox jumps over the lazy dog 0123456789",
+                          fill=(20, 20, 20))
+    return image
+
+
+def bench_detect(args):
+    """在 4K 截图上检测文字块，平均耗时超过 --max-ms 时失败（覆盖窗口的一帧预算）"""
+    screen = _synthetic_screen()
+    blocks = detect_text_blocks(screen)
+    mean_ms, best_ms = _timeit(lambda: detect_text_blocks(screen), args.repeat)
+    print(f"detect {screen.width}x{screen.height}: blocks={len(blocks)} mean={mean_ms:6.1f}ms "
+          f"best={best_ms:6.1f}ms (limit: {args.max_ms}ms)")
+    if mean_ms > args.max_ms:
+        print("FAIL: 文字块检测超过一帧预算")
+        sys.exit(1)
+
+
+def _thread_wakeups():
+    """{线程号: 上下文切换次数}，读取 /proc，非 Linux 平台返回空字典"""
+    counts = {}
+    task_dir = f"/proc/{os.getpid()}/task"
+    if not os.path.isdir(task_dir):
+        return counts
+    for tid in os.listdir(task_dir):
+        try:
+            with open(f"{task_dir}/{tid}/status") as f:
+                counts[int(tid)] = sum(int(line.split()[1]) for line in f if "ctxt_switches" in line)
+        except (OSError, ValueError):
+            continue
+    return counts
+
+
+def bench_idle(args):
+    """启动所有后台线程后空闲一段时间，统计各线程的唤醒次数和进程 CPU 时间，超过阈值时失败"""
+    import threading
+    from log_handler import UILogger
+    from single_instance import SingleInstance
+
+    logger = UILogger(lambda message: None)
+    logger.start()
+    supervisor = EngineSupervisor(_temp_factory(0.01, 0))
+    supervisor.start("", "")
+    workdir = tempfile.mkdtemp()
+    instance = SingleInstance(address=os.path.join(workdir, "ipc.sock") if sys.platform != "win32" else None,
+                              lock_path=os.path.join(workdir, "ipc.lock"))
+    instance.acquire()
+    instance.serve(lambda command, args: None)
+    time.sleep(0.5)  # 等待各线程进入空闲等待
+
+    names = {t.native_id: t.name for t in threading.enumerate()}
+    before, cpu_before = _thread_wakeups(), time.process_time()
+    time.sleep(args.idle_seconds)
+    after, cpu_used = _thread_wakeups(), time.process_time() - cpu_before
+
+    main_tid = threading.main_thread().native_id
+    wakeups = 0
+    for tid, count in sorted(after.items()):
+        if tid == main_tid:
+            continue  # 主线程自身的 sleep 不计
+        delta = count - before.get(tid, count)
+        wakeups += delta
+        print(f"  thread {names.get(tid, tid)!s:<24} wakeups={delta}")
+    print(f"idle {args.idle_seconds:.1f}s: wakeups={wakeups} cpu={cpu_used * 1000:.1f}ms "
+          f"(limits: wakeups<={args.max_wakeups}, cpu<={args.max_cpu_ms}ms)")
+
+    instance.close()
+    supervisor.shutdown()
+    logger.stop()
+    if wakeups > args.max_wakeups or cpu_used * 1000 > args.max_cpu_ms:
+        print("FAIL: 空闲时后台开销超过阈值")
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    "capture": bench_capture,
+    "client": bench_client,
+    "detect": bench_detect,
+    "idle": bench_idle,
+    "memory": bench_memory,
+    "postprocess": bench_postprocess,
+    "preprocess": bench_preprocess,
+    "regions": bench_regions,
+    "speculative": bench_speculative,
+    "taskid": bench_taskid,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ocr2Clip 性能基准")
+    parser.add_argument("name", choices=sorted(BENCHMARKS), help="要运行的基准")
+    parser.add_argument("--repeat", type=int, default=10, help="重复次数")
+    parser.add_argument("--budget-mb", type=int, default=768, help="memory 基准的内存预算(MB)")
+    parser.add_argument("--max-ms", type=float, default=30.0, help="detect 基准允许的平均耗时(ms)")
+    parser.add_argument("--drag-ms", type=int, default=200, help="speculative 基准中停顿后继续拖动的时长(ms)")
+    parser.add_argument("--idle-seconds", type=float, default=5.0, help="idle 基准的空闲时长(秒)")
+    parser.add_argument("--max-wakeups", type=int, default=5, help="idle 基准允许的后台线程唤醒总数")
+    parser.add_argument("--max-cpu-ms", type=float, default=20.0, help="idle 基准允许的CPU时间(ms)")
+    args = parser.parse_args()
+    BENCHMARKS[args.name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import logging
+from PIL import Image, ImageGrab
+
+# 动态导入，非 Windows 环境下退化为单显示器
+try:
+    import win32api
+except ImportError:
+    win32api = None
+
+try:
+    import win32gui
+    import win32ui
+except ImportError:
+    win32gui = win32ui = None
+
+try:
+    import ctypes
+    _shcore = ctypes.windll.shcore
+except (ImportError, AttributeError, OSError):
+    _shcore = None
+
+try:
+    _user32 = ctypes.windll.user32
+except (NameError, AttributeError, OSError):
+    _user32 = None
+
+CAPTURE_MODE_CURSOR = "cursor"  # 只截取鼠标所在的显示器
+CAPTURE_MODE_ALL = "all"        # 截取所有显示器
+
+_DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2 = -4
+_PROCESS_PER_MONITOR_DPI_AWARE = 2
+_E_ACCESSDENIED = -2147024891  # 0x80070005：进程的 DPI 感知已经设置过
+_SRCCOPY = 0x00CC0020
+GRAB_BYTES_PER_PIXEL = 4  # BitBlt 的位图和 GetBitmapBits 的副本都是每像素4字节（BGRX）
+_CAPTUREBLT = 0x40000000  # 同时截取分层（半透明）窗口
+
+
+_dpi_aware = None
+
+
+def enable_dpi_awareness():
+    """声明进程按显示器感知 DPI，必须在创建任何窗口（包括 Tk 根窗口）之前调用；重复调用直接返回上次的结果
+
+    未声明时，缩放显示器上的 EnumDisplayMonitors、GetCursorPos 和 Tk 窗口坐标都是按 DPI 虚拟化后的值，
+    而截图是物理像素，混合 DPI 的多显示器上二者无法对应。声明后这些坐标与截图一样都是物理像素。
+    """
+    global _dpi_aware
+    if _dpi_aware is not None:
+        return _dpi_aware
+    _dpi_aware = False
+    if not _user32:
+        return _dpi_aware
+    try:
+        # Windows 10 1703 及以上
+        if _user32.SetProcessDpiAwarenessContext(ctypes.c_void_p(_DPI_AWARENESS_CONTEXT_PER_MONITOR_AWARE_V2)):
+            _dpi_aware = True
+            return _dpi_aware
+    except AttributeError:
+        pass
+    try:
+        # Windows 8.1 及以上
+        if _shcore and _shcore.SetProcessDpiAwareness(_PROCESS_PER_MONITOR_DPI_AWARE) in (0, _E_ACCESSDENIED):
+            _dpi_aware = True
+            return _dpi_aware
+    except (AttributeError, OSError) as e:
+        logging.debug(f"设置按显示器 DPI 感知失败: {e}")
+    # Windows 7 及以下所有显示器共用系统 DPI，声明系统级感知即可得到物理像素
+    _dpi_aware = bool(_user32.SetProcessDPIAware())
+    if not _dpi_aware:
+        logging.warning("无法声明 DPI 感知，缩放显示器上的截图坐标可能不准确。")
+    return _dpi_aware
+
+
+class Monitor:
+    """描述一个显示器在虚拟桌面中的位置
+
+    x, y, width, height 为虚拟桌面坐标；进程已通过 enable_dpi_awareness() 声明 DPI 感知，
+    因此它们是物理像素，与截图像素以及 Tk 窗口坐标一一对应。
+    scale 为该显示器的缩放比例（DPI / 96），仅供参考，不参与坐标换算。
+    """
+
+    def __init__(self, x, y, width, height, scale=1.0, name=""):
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.scale = scale or 1.0
+        self.name = name
+
+    @property
+    def bbox(self):
+        return (self.x, self.y, self.x + self.width, self.y + self.height)
+
+    def contains(self, x, y):
+        return self.x <= x < self.x + self.width and self.y <= y < self.y + self.height
+
+    def overlay_geometry(self):
+        """返回覆盖窗口的位置和尺寸 (x, y, width, height)
+
+        所有显示器共用同一个坐标空间：不能按各显示器自己的缩放比例换算原点，
+        否则与主显示器 DPI 不同的显示器会被放到错误的位置。
+        """
+        return (self.x, self.y, self.width, self.height)
+
+    def to_physical(self, box, logical_size):
+        """将覆盖窗口内的逻辑坐标框映射为该显示器截图中的物理像素坐标框"""
+        sx = self.width / logical_size[0] if logical_size[0] else 1.0
+        sy = self.height / logical_size[1] if logical_size[1] else 1.0
+        left, top, right, bottom = box
+        return (max(0, round(left * sx)), max(0, round(top * sy)),
+                min(self.width, round(right * sx)), min(self.height, round(bottom * sy)))
+
+    def to_logical(self, box, logical_size):
+        """将截图中的物理像素坐标框映射为覆盖窗口内的逻辑坐标框"""
+        sx = logical_size[0] / self.width if self.width else 1.0
+        sy = logical_size[1] / self.height if self.height else 1.0
+        left, top, right, bottom = box
+        return (round(left * sx), round(top * sy), round(right * sx), round(bottom * sy))
+
+    def __repr__(self):
+        return f"Monitor({self.name!r}, {self.bbox}, scale={self.scale})"
+
+
+class CaptureBackend:
+    """截图后端接口：枚举显示器、获取鼠标位置、截取单个显示器"""
+
+    def monitors(self):
+        raise NotImplementedError
+
+    def cursor_position(self):
+        raise NotImplementedError
+
+    def grab(self, monitor):
+        raise NotImplementedError
+
+    def grab_overhead_bytes(self, monitor):
+        """截取该显示器时，除返回的图像外额外瞬时占用的字节数"""
+        return 0
+
+    def monitor_at_cursor(self):
+        """返回鼠标所在的显示器，找不到时返回主显示器"""
+        monitors = self.monitors()
+        x, y = self.cursor_position()
+        for monitor in monitors:
+            if monitor.contains(x, y):
+                return monitor
+        return monitors[0]
+
+    def select_monitors(self, mode):
+        """按截图模式选出需要截取的显示器"""
+        cursor_monitor = self.monitor_at_cursor()
+        if mode == CAPTURE_MODE_ALL:
+            # 鼠标所在显示器排在最前，内存预算不足时优先保留
+            return [cursor_monitor] + [m for m in self.monitors() if m.bbox != cursor_monitor.bbox]
+        return [cursor_monitor]
+
+
+class PilCaptureBackend(CaptureBackend):
+    """真实截图后端，按显示器截取：Windows 上用 BitBlt 复制单个显示器，其他平台退化为 PIL.ImageGrab
+
+    非 Windows 平台只有一个显示器，其尺寸从 tk_root 的 winfo_screenwidth/winfo_screenheight 读取；
+    没有 tk_root 时截取一次全屏得到尺寸并缓存，不会每次枚举显示器都截全屏。
+    """
+
+    def __init__(self, tk_root=None):
+        # 通常已在程序启动时声明；这里兜底，保证枚举到的显示器坐标与截图同为物理像素
+        enable_dpi_awareness()
+        self.tk_root = tk_root
+        self._screen_size = None
+
+    def monitors(self):
+        if not win32api:
+            width, height = self._single_screen_size()
+            return [Monitor(0, 0, width, height, name="primary")]
+
+        monitors = []
+        for handle, _, rect in win32api.EnumDisplayMonitors():
+            info = win32api.GetMonitorInfo(handle)
+            left, top, right, bottom = info.get("Monitor", rect)
+            monitors.append(Monitor(left, top, right - left, bottom - top,
+                                    scale=self._monitor_scale(handle), name=info.get("Device", "")))
+        # 主显示器排在最前，作为兜底
+        monitors.sort(key=lambda m: (m.x, m.y) != (0, 0))
+        return monitors
+
+    def _single_screen_size(self):
+        if self.tk_root is not None:
+            return self.tk_root.winfo_screenwidth(), self.tk_root.winfo_screenheight()
+        if self._screen_size is None:
+            self._screen_size = ImageGrab.grab().size
+        return self._screen_size
+
+    def _monitor_scale(self, handle):
+        if not _shcore:
+            return 1.0
+        dpi_x, dpi_y = ctypes.c_uint(), ctypes.c_uint()
+        try:
+            # MDT_EFFECTIVE_DPI = 0
+            if _shcore.GetDpiForMonitor(int(handle), 0, ctypes.byref(dpi_x), ctypes.byref(dpi_y)) == 0:
+                return dpi_x.value / 96.0
+        except OSError as e:
+            logging.debug(f"获取显示器DPI失败: {e}")
+        return 1.0
+
+    def cursor_position(self):
+        if win32api:
+            return win32api.GetCursorPos()
+        return (0, 0)
+
+    def grab(self, monitor):
+        if win32gui and win32ui:
+            return self._grab_bitblt(monitor)
+        return ImageGrab.grab(bbox=monitor.bbox)
+
+    def grab_overhead_bytes(self, monitor):
+        # BitBlt：GDI 位图 + GetBitmapBits 的字节副本；ImageGrab：整个屏幕的原始缓冲区（非 Windows 只有一个显示器）
+        buffers = 2 if win32gui and win32ui else 1
+        return buffers * monitor.width * monitor.height * GRAB_BYTES_PER_PIXEL
+
+    @staticmethod
+    def _grab_bitblt(monitor):
+        """用 BitBlt 只复制该显示器的矩形
+
+        ImageGrab.grab(all_screens=True) 会先截取整个虚拟桌面再在 Python 中裁剪，
+        多显示器时每次截图都要分配整个桌面的位图，这里的开销只与该显示器的尺寸有关。
+        """
+        width, height = monitor.width, monitor.height
+        desktop = win32gui.GetDesktopWindow()
+        desktop_dc = win32gui.GetWindowDC(desktop)
+        source_dc = win32ui.CreateDCFromHandle(desktop_dc)
+        memory_dc = source_dc.CreateCompatibleDC()
+        bitmap = win32ui.CreateBitmap()
+        try:
+            bitmap.CreateCompatibleBitmap(source_dc, width, height)
+            memory_dc.SelectObject(bitmap)
+            memory_dc.BitBlt((0, 0), (width, height), source_dc, (monitor.x, monitor.y), _SRCCOPY | _CAPTUREBLT)
+            bits = bitmap.GetBitmapBits(True)
+        finally:
+            win32gui.DeleteObject(bitmap.GetHandle())
+            memory_dc.DeleteDC()
+            source_dc.DeleteDC()
+            win32gui.ReleaseDC(desktop, desktop_dc)
+        return Image.frombuffer("RGB", (width, height), bits, "raw", "BGRX", 0, 1)
+
+
+class FakeCaptureBackend(CaptureBackend):
+    """用于测试和基准的伪后端，按显示器尺寸生成合成图像，并统计截取的像素数
+
+    与 BitBlt 路径一样先生成 BGRX 位图和它的字节副本，再解码为 RGB 图像，瞬时内存与真实截图一致。
+    """
+
+    def __init__(self, monitors=None, cursor=(0, 0), color=(200, 200, 200)):
+        self._monitors = monitors or [Monitor(0, 0, 1920, 1080, name="fake")]
+        self._cursor = cursor
+        self.color = color
+        self.grabbed_pixels = 0
+        self.grab_count = 0
+
+    def monitors(self):
+        return list(self._monitors)
+
+    def cursor_position(self):
+        return self._cursor
+
+    def move_cursor(self, x, y):
+        self._cursor = (x, y)
+
+    def grab(self, monitor):
+        self.grab_count += 1
+        self.grabbed_pixels += monitor.width * monitor.height
+        size = (monitor.width, monitor.height)
+        bits = Image.new("RGBX", size, self.color[::-1] + (0,)).tobytes()
+        return Image.frombuffer("RGB", size, bits, "raw", "BGRX", 0, 1)
+
+    def grab_overhead_bytes(self, monitor):
+        return 2 * monitor.width * monitor.height * GRAB_BYTES_PER_PIXEL
+
+
+def create_capture_backend(name="pil", tk_root=None):
+    """根据名称创建截图后端；tk_root 供真实后端读取屏幕尺寸"""
+    if name == "fake":
+        return FakeCaptureBackend()
+    return PilCaptureBackend(tk_root)
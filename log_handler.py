@@ -26,19 +26,20 @@ class UILogger:
         self.print_redirector = None # 将在 setup_logging 中设置
 
     def poll_log_queue(self):
-        """从队列中获取日志并更新UI"""
+        """从队列中获取日志并更新UI；阻塞等待新日志，空闲时不唤醒，收到 None 时退出"""
         while not self._stop_event.is_set():
-            try:
-                record = self.log_queue.get(block=True, timeout=0.1)
-                self.ui_log_callback(record + '\n')
-            except queue.Empty:
-                continue
+            record = self.log_queue.get()
+            if record is None:
+                break
+            self.ui_log_callback(record + '\n')
 
     def start(self):
         self._thread.start()
 
     def stop(self):
         self._stop_event.set()
+        # 放入哨兵值唤醒阻塞在队列上的线程
+        self.log_queue.put(None)
 
     def set_verbose(self, is_verbose):
         """动态设置日志详细程度"""
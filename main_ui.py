@@ -1,17 +1,30 @@
+import logging
 import tkinter as tk
 from tkinter import ttk, scrolledtext
 
+from metrics import metrics
+
+METRICS_REFRESH_MS = 1000
+WINDOW_SIZE = (600, 600)  # 100% 缩放（96 DPI）下的窗口尺寸
+
+
+def ui_scale(widget):
+    """界面缩放比例：进程声明了 DPI 感知后 Tk 按实际 DPI 放大字体，固定的像素尺寸需要乘以该比例"""
+    return float(widget.tk.call("tk", "scaling")) * 72 / 96
+
 class MainUI(tk.Tk):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.withdraw()  # 初始隐藏主窗口
         self.title("Ocr2Clip 控制面板")
         self.iconbitmap('icon.ico') # 设置窗口左上角图标
-        self.geometry("600x450")
+        scale = ui_scale(self)
+        self.geometry(f"{round(WINDOW_SIZE[0] * scale)}x{round(WINDOW_SIZE[1] * scale)}")
         self.resizable(False, False)
         
         self.protocol("WM_DELETE_WINDOW", self.hide_window)
 
+        self.metrics_after_id = None
         self._create_widgets()
 
     def _create_widgets(self):
@@ -27,6 +40,7 @@ class MainUI(tk.Tk):
         # 这个 Frame 将由外部代码填充
         self.settings_frame = ttk.Frame(self.notebook, padding="10")
         self.notebook.add(self.settings_frame, text="  设置  ")
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self._schedule_metrics_refresh())
 
     def _create_status_page(self):
         # 状态标签
@@ -37,6 +51,24 @@ class MainUI(tk.Tk):
         status_display = ttk.Label(status_label_frame, textvariable=self.status_var, font=("Microsoft YaHei", 12, "bold"))
         status_display.pack()
 
+        # 性能面板
+        perf_frame = ttk.LabelFrame(self.status_frame, text="性能", padding="10")
+        perf_frame.pack(fill="x", pady=5)
+        self.metric_vars = {}
+        self.metric_values = {}
+        fields = [
+            ("captures", "截图/分钟"), ("tasks", "进行中/排队"), ("free_ids", "空闲任务ID"),
+            ("cache", "缓存命中率"), ("memory", "进程内存"),
+        ]
+        for column, (key, text) in enumerate(fields):
+            ttk.Label(perf_frame, text=text).grid(row=0, column=column, sticky="w", padx=(0, 15))
+            self.metric_vars[key] = tk.StringVar(value="—")
+            ttk.Label(perf_frame, textvariable=self.metric_vars[key], font=("Consolas", 9)).grid(row=1, column=column, sticky="w")
+        ttk.Label(perf_frame, text="阶段耗时 (p50/p95/p99)").grid(row=2, column=0, columnspan=5, sticky="w", pady=(5, 0))
+        self.metric_vars["latency"] = tk.StringVar(value="—")
+        ttk.Label(perf_frame, textvariable=self.metric_vars["latency"], font=("Consolas", 9),
+                  justify="left").grid(row=3, column=0, columnspan=5, sticky="w")
+
         # 日志区域
         log_frame = ttk.LabelFrame(self.status_frame, text="运行日志", padding="10")
         log_frame.pack(expand=True, fill="both", pady=5)
@@ -44,11 +76,48 @@ class MainUI(tk.Tk):
         self.log_text = scrolledtext.ScrolledText(log_frame, wrap=tk.WORD, state='disabled', font=("Consolas", 9))
         self.log_text.pack(expand=True, fill="both")
 
+    def _collect_metrics(self):
+        """从指标注册表生成面板上各字段的显示文本"""
+        free_ids = metrics.gauge("engine.free_task_ids")
+        hit_rate = metrics.hit_rate("cache")
+        memory = metrics.gauge("process.memory")
+        latency_lines = []
+        for name in metrics.sample_names():
+            p50, p95, p99 = metrics.percentiles(name)
+            latency_lines.append(f"{name[6:] if name.startswith('stage.') else name:<10}"
+                                 f"{p50 * 1000:7.0f}{p95 * 1000:7.0f}{p99 * 1000:7.0f} ms")
+        return {
+            "captures": str(metrics.rate_per_minute("captures")),
+            "tasks": f"{metrics.gauge('ocr.inflight', 0)} / {metrics.gauge('ocr.queued', 0)}",
+            "free_ids": "—" if free_ids is None else str(free_ids),
+            "cache": "—" if hit_rate is None else f"{hit_rate:.0%}",
+            "memory": "—" if not memory else f"{memory / 2**20:.0f} MB",
+            "latency": "\n".join(latency_lines) or "—",
+        }
+
+    def _schedule_metrics_refresh(self):
+        """在状态页可见时按固定频率刷新性能面板"""
+        if self.metrics_after_id is None:
+            self.metrics_after_id = self.after(0, self._refresh_metrics)
+
+    def _refresh_metrics(self):
+        self.metrics_after_id = None
+        # 窗口隐藏或不在状态页时停止刷新，由 show_window / 切换标签页重新启动
+        if self.state() == 'withdrawn' or self.notebook.select() != str(self.status_frame):
+            return
+        for key, text in self._collect_metrics().items():
+            # 只更新发生变化的控件
+            if self.metric_values.get(key) != text:
+                self.metric_values[key] = text
+                self.metric_vars[key].set(text)
+        self.metrics_after_id = self.after(METRICS_REFRESH_MS, self._refresh_metrics)
+
     def show_window(self):
         """显示并置顶窗口"""
         self.deiconify()
         self.lift()
         self.focus_force()
+        self._schedule_metrics_refresh()
 
     def hide_window(self):
         """隐藏窗口"""
@@ -89,7 +158,7 @@ class MainUI(tk.Tk):
             screen_height = self.winfo_screenheight()
             toast_width = toast.winfo_width()
             x = (screen_width // 2) - (toast_width // 2)
-            y = screen_height - 100
+            y = screen_height - round(100 * ui_scale(self))
             toast.geometry(f'+{x}+{y}')
 
             toast.after(2000, toast.destroy)
@@ -0,0 +1,116 @@
+import ctypes
+import logging
+import os
+import sys
+import tracemalloc
+
+
+def _windows_memory_counters():
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong),
+                    ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                    ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                    ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                    ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    handle = ctypes.windll.kernel32.GetCurrentProcess()
+    if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+        return counters
+    return None
+
+
+def process_memory():
+    """返回当前进程的常驻内存（字节），无法获取时返回 0"""
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters else 0
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def reset_peak_memory():
+    """重置进程的常驻内存峰值，之后 peak_process_memory() 从当前值重新计算；不支持时返回 False"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_process_memory():
+    """返回进程的常驻内存峰值（字节），包括阶段快照之间短暂分配又释放的缓冲区；无法获取时返回 0
+
+    Windows 上无法重置峰值，返回的是进程启动以来的峰值。
+    """
+    if sys.platform == "win32":
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize if counters else 0
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+class MemoryTracer:
+    """按阶段记录内存快照，用于调试截图流程的内存占用
+
+    tracemalloc 只能跟踪 Python 分配器，PIL 的像素缓冲区由 C 层直接分配，
+    因此每个阶段同时记录进程常驻内存（RSS）。未启用时所有方法均为空操作。
+    """
+
+    def __init__(self, enabled=False, top=5):
+        self.enabled = enabled
+        self.top = top
+        self.stages = []  # [(stage, traced_current, traced_peak, rss)]
+        self._last_snapshot = None
+        self._started_tracing = False
+
+    def start(self):
+        if not self.enabled:
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        tracemalloc.reset_peak()
+        self.stages = []
+        self._last_snapshot = tracemalloc.take_snapshot()
+        self.snapshot("start")
+
+    def snapshot(self, stage):
+        """记录一个阶段的内存状态，并在调试日志中输出与上一阶段相比增长最多的分配位置"""
+        if not self.enabled or not tracemalloc.is_tracing():
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        rss = process_memory()
+        self.stages.append((stage, current, peak, rss))
+        snapshot = tracemalloc.take_snapshot()
+        if self._last_snapshot is not None:
+            for stat in snapshot.compare_to(self._last_snapshot, "lineno")[:self.top]:
+                logging.debug(f"[内存:{stage}] {stat}")
+        self._last_snapshot = snapshot
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self._last_snapshot = None
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def peak_rss(self):
+        return max((rss for _, _, _, rss in self.stages), default=0)
+
+    def report(self):
+        """以日志形式输出各阶段的内存占用"""
+        for stage, current, peak, rss in self.stages:
+            logging.info(f"[内存] {stage:<10} traced={current / 2**20:7.1f}MB "
+                         f"traced_peak={peak / 2**20:7.1f}MB rss={rss / 2**20:7.1f}MB")
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class MetricsRegistry:
+    """进程内共享的指标注册表：计数器、仪表、耗时样本和事件速率
+
+    所有写操作都只做 O(1) 的记录，统计（百分位、速率）在读取时计算，
+    因此面板不显示时几乎没有额外开销。
+    """
+
+    def __init__(self, window=256):
+        self._lock = threading.Lock()
+        self._window = window
+        self._counters = {}
+        self._gauges = {}
+        self._providers = {}  # {name: callable}，读取时才求值的仪表
+        self._samples = {}    # {name: deque[秒]}
+        self._events = {}     # {name: deque[时间戳]}
+
+    def incr(self, name, n=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def counter(self, name):
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = value
+
+    def add_gauge(self, name, delta):
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def register_gauge(self, name, provider):
+        """注册一个按需求值的仪表，provider 抛出异常或返回 None 时视为无数据"""
+        with self._lock:
+            self._providers[name] = provider
+
+    def unregister_gauge(self, name):
+        with self._lock:
+            self._providers.pop(name, None)
+
+    def gauge(self, name, default=None):
+        with self._lock:
+            if name in self._gauges:
+                return self._gauges[name]
+            provider = self._providers.get(name)
+        if provider is None:
+            return default
+        try:
+            value = provider()
+        except Exception:
+            return default
+        return default if value is None else value
+
+    def observe(self, name, seconds):
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self._window)
+            samples.append(seconds)
+
+    @contextmanager
+    def timer(self, name):
+        """记录 with 块的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        """返回最近样本的百分位耗时（秒），无样本时返回 None"""
+        with self._lock:
+            samples = sorted(self._samples.get(name, ()))
+        if not samples:
+            return None
+        last = len(samples) - 1
+        return tuple(samples[min(last, int(round(p / 100 * last)))] for p in points)
+
+    def sample_names(self):
+        with self._lock:
+            return sorted(self._samples)
+
+    def mark(self, name):
+        """记录一次事件，用于计算每分钟速率"""
+        now = time.monotonic()
+        with self._lock:
+            events = self._events.get(name)
+            if events is None:
+                events = self._events[name] = deque(maxlen=self._window)
+            events.append(now)
+
+    def rate_per_minute(self, name):
+        cutoff = time.monotonic() - 60
+        with self._lock:
+            return sum(1 for t in self._events.get(name, ()) if t >= cutoff)
+
+    def hit_rate(self, prefix):
+        """根据 <prefix>.hit / <prefix>.miss 计数器计算命中率，无数据时返回 None"""
+        hits, misses = self.counter(f"{prefix}.hit"), self.counter(f"{prefix}.miss")
+        if hits + misses == 0:
+            return None
+        return hits / (hits + misses)
+
+
+# 创建一个全局单例
+metrics = MetricsRegistry()
@@ -0,0 +1,397 @@
+"""可嵌入的 OCR 客户端
+
+    with OcrClient(engine_path, lib_dir) as client:
+        result = client.ocr(image)              # 阻塞识别，返回 OcrResult
+        result = await client.aocr(image)       # asyncio 协程版本
+        for result in client.map(images):       # 同时识别多张，按完成顺序逐个返回
+            print(result.index, result.text)
+
+识别结果只以 OcrResult 返回，不会写入剪贴板；托盘程序的剪贴板逻辑在 ocr_tool 中。
+"""
+import asyncio
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import metrics
+from ocr_engine import EngineSupervisor
+from preprocess import preprocess_image
+
+OCR_TIMEOUT = 10    # 任务派发后等待结果的秒数
+QUEUE_TIMEOUT = 60  # 引擎启动、切换或重启期间任务最多排队的秒数，应明显大于 EngineSupervisor.backoff_max
+
+ERROR_NOT_RUNNING = "not_running"  # 引擎未运行
+ERROR_SUBMIT = "submit_failed"     # 保存临时文件或提交任务失败
+ERROR_TIMEOUT = "timeout"          # 排队或识别超时
+
+
+def ocr_result_text(results: dict) -> str:
+    """将引擎返回的识别结果拼接为文本"""
+    if results and results.get('ocrResult'):
+        return "\n".join([item['text'] for item in results['ocrResult']])
+    return ""
+
+
+def filter_results(results, box):
+    """只保留中心点落在 box (left, top, right, bottom) 内的识别项，location 换算为以 box 左上角为原点
+
+    有识别项缺少 location 时无法判断，返回 None。
+    """
+    left, top, right, bottom = box
+    kept = []
+    for item in results.get("ocrResult") or []:
+        location = item.get("location")
+        if not location or location.get("left") is None:
+            return None
+        center_x = (location["left"] + location["right"]) / 2
+        center_y = (location["top"] + location["bottom"]) / 2
+        if left <= center_x < right and top <= center_y < bottom:
+            kept.append(dict(item, location={
+                "left": location["left"] - left, "top": location["top"] - top,
+                "right": location["right"] - left, "bottom": location["bottom"] - top,
+            }))
+    return dict(results, ocrResult=kept)
+
+
+class OcrResult:
+    """一次识别的结构化结果"""
+
+    def __init__(self, index=None, text=None, items=None, latency=None, error=None):
+        self.index = index        # 在 map() 输入中的位置，单张识别时为 None
+        self.text = text          # 经过后处理的文本，失败时为 None
+        self.items = items or []  # 引擎返回的识别项 [{"text", "location", ...}]，location 为原图坐标
+        self.latency = latency    # 从提交到拿到结果的秒数
+        self.error = error        # 失败时为 ERROR_* 之一
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        return f"OcrResult(index={self.index}, ok={self.ok}, items={len(self.items)}, error={self.error})"
+
+
+class _Submission:
+    """已提交给引擎、尚未取回结果的图像"""
+
+    def __init__(self, task, temp_path, transform, started):
+        self.task = task
+        self.temp_path = temp_path
+        self.transform = transform
+        self.started = started
+
+
+class OcrClient:
+    """管理引擎生命周期并提供同步、asyncio 和批量识别接口
+
+    preprocess 为 PreprocessOptions 时先裁剪空白边距并缩放，识别结果中的 location 会映射回原图坐标；
+    postprocess 为 TextPostprocessor 时对每个结果的文本做后处理。传入 supervisor 时与其他客户端共用引擎，
+    此时 start/configure/close 仍然作用于该引擎。
+    """
+
+    def __init__(self, engine_path=None, lib_dir=None, preprocess=None, postprocess=None, supervisor=None,
+                 temp_dir=None, queue_timeout=QUEUE_TIMEOUT, ocr_timeout=OCR_TIMEOUT):
+        self.engine_path = engine_path
+        self.lib_dir = lib_dir
+        self.preprocess = preprocess
+        self.postprocess = postprocess
+        self.supervisor = supervisor or EngineSupervisor()
+        self.temp_dir = temp_dir or tempfile.gettempdir()
+        self.queue_timeout = queue_timeout
+        self.ocr_timeout = ocr_timeout
+
+    # --- 生命周期 ---
+    def start(self, engine_path=None, lib_dir=None):
+        """启动引擎，成功返回 True；已在运行时直接返回 True"""
+        self.engine_path = engine_path or self.engine_path
+        self.lib_dir = lib_dir or self.lib_dir
+        if self.supervisor.is_running():
+            return True
+        logging.debug("正在初始化 OCR 引擎...")
+        return self.supervisor.start(self.engine_path, self.lib_dir)
+
+    def configure(self, engine_path, lib_dir):
+        """路径变化时在后台启动新引擎并无缝切换；引擎未运行时直接启动"""
+        self.engine_path, self.lib_dir = engine_path, lib_dir
+        if self.supervisor.is_running() and self.supervisor.config() == (engine_path, lib_dir):
+            return True
+        return self.supervisor.swap(engine_path, lib_dir)
+
+    def is_running(self):
+        return self.supervisor.is_running()
+
+    def close(self):
+        """关闭引擎，未完成的任务以失败结束"""
+        if self.supervisor.is_running():
+            logging.debug("正在关闭 OCR 引擎...")
+            self.supervisor.shutdown()
+            logging.debug("OCR 引擎已关闭。")
+
+    def __enter__(self):
+        if not self.start():
+            raise RuntimeError("无法启动 OCR 引擎")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # --- 识别 ---
+    def ocr(self, image):
+        """阻塞识别一张图像"""
+        if not self.is_running():
+            return OcrResult(error=ERROR_NOT_RUNNING)
+        submission = self._submit(image)
+        if submission is None:
+            return OcrResult(error=ERROR_SUBMIT)
+        submission.task.wait(self.queue_timeout, self.ocr_timeout)
+        return self._finish(submission)
+
+    async def aocr(self, image):
+        """识别一张图像的协程版本
+
+        预处理和保存在线程池中进行；之后由引擎回调线程通过 call_soon_threadsafe 唤醒事件循环，不轮询。
+        """
+        if not self.is_running():
+            return OcrResult(error=ERROR_NOT_RUNNING)
+        loop = asyncio.get_running_loop()
+        submitting = loop.run_in_executor(None, self._submit, image)
+        try:
+            # shield：协程被取消时提交仍在线程池中进行，不能丢下它产生的任务和临时文件
+            submission = await asyncio.shield(submitting)
+        except asyncio.CancelledError:
+            submitting.add_done_callback(self._discard_submitted)
+            raise
+        if submission is None:
+            return OcrResult(error=ERROR_SUBMIT)
+        done = loop.create_future()
+
+        def wake(task):
+            try:
+                loop.call_soon_threadsafe(lambda: done.done() or done.set_result(None))
+            except RuntimeError:  # 事件循环已关闭
+                pass
+
+        submission.task.add_done_callback(wake)
+        try:
+            await asyncio.wait_for(done, self.queue_timeout + self.ocr_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._discard(submission)
+            raise
+        return self._finish(submission)
+
+    def map(self, images):
+        """同时识别多张图像，按完成顺序逐个产出 OcrResult，index 为图像在 images 中的位置
+
+        所有图像先并行预处理并提交，由引擎的多个任务槽同时处理；完成通知经队列从回调线程送达，
+        总耗时接近最慢的一张而不是各张之和。提前停止迭代时取消其余任务。
+        """
+        images = list(images)
+        if not self.is_running():
+            for index in range(len(images)):
+                yield OcrResult(index=index, error=ERROR_NOT_RUNNING)
+            return
+
+        submissions = self._submit_all(images)
+        completed = queue.SimpleQueue()
+        outstanding = {index for index, submission in enumerate(submissions) if submission is not None}
+        for index in outstanding:
+            submissions[index].task.add_done_callback(lambda task, index=index: completed.put(index))
+
+        deadline = time.monotonic() + self.queue_timeout + self.ocr_timeout
+        try:
+            for index, submission in enumerate(submissions):
+                if submission is None:
+                    yield OcrResult(index=index, error=ERROR_SUBMIT)
+            while outstanding:
+                try:
+                    index = completed.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                outstanding.discard(index)
+                yield self._finish(submissions[index], index)
+            while outstanding:
+                index = min(outstanding)
+                outstanding.discard(index)
+                yield self._finish(submissions[index], index)
+        finally:
+            for index in outstanding:
+                self._discard(submissions[index])
+
+    def ocr_many(self, images):
+        """同时识别多张图像，按 images 的顺序返回 OcrResult 列表"""
+        return sorted(self.map(images), key=lambda result: result.index)
+
+    # --- 内部 ---
+    def _submit(self, image, speculative=False):
+        """预处理并保存到临时文件后提交任务，失败返回 None"""
+        started = time.perf_counter()
+        transform = None
+        if self.preprocess is not None:
+            with metrics.timer("stage.preprocess"):
+                image, transform = preprocess_image(image, self.preprocess)
+        metrics.incr("ocr.pixels_sent", image.width * image.height)
+
+        # 每个任务使用独立的临时文件，回调按路径对应到任务，允许多个任务同时进行
+        temp_path = os.path.join(self.temp_dir, f"temp_screenshot_{uuid.uuid4().hex[:8]}.png")
+        try:
+            with metrics.timer("stage.save"):
+                image.save(temp_path)
+        except Exception as e:
+            logging.error(f"保存临时截图文件失败: {e}", exc_info=True)
+            return None
+
+        logging.debug(f"正在提交OCR任务: {temp_path}")
+        try:
+            task = self.supervisor.submit(temp_path, speculative=speculative)
+        except RuntimeError as e:
+            logging.error(f"提交OCR任务失败: {e}")
+            _remove_temp_file(temp_path)
+            return None
+        metrics.add_gauge("ocr.inflight", 1)
+        return _Submission(task, temp_path, transform, started)
+
+    def _submit_all(self, images):
+        if not images:
+            return []
+        # 预处理和 PNG 编码在 Pillow 中会释放 GIL，多线程提交可以让各图像的准备工作也并行进行
+        with ThreadPoolExecutor(max_workers=min(len(images), os.cpu_count() or 1)) as pool:
+            return list(pool.map(self._submit, images))
+
+    def _finish(self, submission, index=None, region=None, started=None):
+        """取回已完成任务的结果并删除临时文件；任务未完成时按超时处理
+
+        region 为相对于提交图像的坐标框时只保留其中的识别项；started 用于指定计时起点。
+        """
+        task = submission.task
+        try:
+            if not task.done():
+                self.supervisor.cancel(task)
+                metrics.incr("ocr.timeout")
+                logging.warning(f"OCR 任务超时！未在{self.ocr_timeout}秒内收到回调结果。")
+                return OcrResult(index=index, error=ERROR_TIMEOUT)
+            latency = time.perf_counter() - (started or submission.started)
+            metrics.observe("stage.ocr", latency)
+            results = task.results
+            if results is None:
+                return OcrResult(index=index, error=ERROR_NOT_RUNNING)
+            if submission.transform is not None:
+                submission.transform.map_results(results)
+            if region is not None:
+                results = filter_results(results, region)
+                if results is None:
+                    return None
+            text = ocr_result_text(results)
+            if self.postprocess is not None and text:
+                with metrics.timer("stage.postprocess"):
+                    text = self.postprocess(text)
+            return OcrResult(index=index, text=text, items=results.get("ocrResult") or [], latency=latency)
+        finally:
+            metrics.add_gauge("ocr.inflight", -1)
+            _remove_temp_file(submission.temp_path)
+
+    def _discard_submitted(self, future):
+        """aocr() 在提交完成前被取消时，提交完成后放弃该任务"""
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            self._discard(future.result())
+
+    def _discard(self, submission):
+        """放弃一个已提交但不再需要的任务"""
+        self.supervisor.cancel(submission.task)
+        metrics.add_gauge("ocr.inflight", -1)
+        _remove_temp_file(submission.temp_path)
+
+
+def _remove_temp_file(temp_path):
+    # 确保能删除临时文件
+    if os.path.exists(temp_path):
+        try:
+            os.remove(temp_path)
+        except OSError as e:
+            print(f"删除临时文件失败: {e}")
+
+
+def _contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+class SpeculativeOcr:
+    """拖动停顿时提前识别当前选区，松开鼠标时直接复用结果
+
+    覆盖窗口在拖动停顿 pause_ms 毫秒后调用 speculate() 在后台提交当前选区；松开鼠标后用 claim()
+    取出包含最终选区的推测任务，result() 的结果按 location 过滤出最终选区内的识别项。
+    推测任务排在普通任务之后派发，同时存活的不超过 max_inflight 个，更早的和最终未被使用的都会取消。
+    """
+
+    SUBMIT_WAIT = 1.0  # claim() 等待正在提交的推测任务的最长秒数
+
+    def __init__(self, client, pause_ms=300, max_inflight=2):
+        self.client = client
+        self.pause_ms = pause_ms
+        self.max_inflight = max_inflight
+        self.hit_boxes = []  # 命中推测结果的最终选区，供会话录制使用
+        self._cond = threading.Condition()
+        self._entries = []   # [(全局物理坐标框, _Submission)]，按提交顺序
+        self._submitting = 0
+        self._closed = False
+
+    def speculate(self, box, image):
+        """在后台线程中提交 box（全局物理坐标）处的截图，与已有推测相同的选区不重复提交"""
+        with self._cond:
+            if self._closed or any(entry[0] == box for entry in self._entries):
+                return
+            self._submitting += 1
+        threading.Thread(target=self._submit, args=(box, image), daemon=True).start()
+
+    def _submit(self, box, image):
+        submission = self.client._submit(image, speculative=True) if self.client.is_running() else None
+        stale = []
+        with self._cond:
+            self._submitting -= 1
+            self._cond.notify_all()
+            if submission is not None:
+                metrics.incr("ocr.speculative")
+                self._entries.append((box, submission))
+                if self._closed:
+                    stale, self._entries = self._entries, []
+                elif len(self._entries) > self.max_inflight:
+                    stale = self._entries[:-self.max_inflight]
+                    del self._entries[:-self.max_inflight]
+        for _, submission in stale:
+            self.client._discard(submission)
+
+    def claim(self, box):
+        """取出包含 box 的推测中最近提交的一个，没有时返回 None；会先等待正在提交的推测"""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._submitting, self.SUBMIT_WAIT)
+            for entry in reversed(self._entries):
+                if _contains(entry[0], box):
+                    self._entries.remove(entry)
+                    return entry
+        return None
+
+    def result(self, entry, box, started=None):
+        """等待推测任务的结果并裁剪到 box 内，结果不可用时返回 None"""
+        spec_box, submission = entry
+        submission.task.wait(self.client.queue_timeout, self.client.ocr_timeout)
+        left, top = box[0] - spec_box[0], box[1] - spec_box[1]
+        region = (left, top, left + box[2] - box[0], top + box[3] - box[1])
+        result = self.client._finish(submission, region=region, started=started)
+        if result is None or not result.ok:
+            return None
+        self.hit_boxes.append(box)
+        return result
+
+    def close(self):
+        """取消所有未被使用的推测任务，之后提交完成的推测也会立即取消"""
+        with self._cond:
+            self._closed = True
+            stale, self._entries = self._entries, []
+        for _, submission in stale:
+            self.client._discard(submission)
@@ -0,0 +1,652 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from metrics import metrics
+
+# 动态导入，避免硬编码
+try:
+    from wechat_ocr.ocr_manager import OcrManager, OCR_MAX_TASK_ID
+except ImportError:
+    OcrManager = None
+    OCR_MAX_TASK_ID = 32
+
+
+class TaskIdUnavailable(Exception):
+    """引擎暂时没有空闲的任务ID，任务应重新排队"""
+
+
+class TaskIdPool:
+    """进程内的空闲任务ID池，兼容 OcrManager 对 multiprocessing.Queue 的用法（put/get/qsize）
+
+    引擎客户端的所有线程都在同一进程内，用 deque + Condition 即可：取、还ID只是一次加锁的
+    列表操作，没有 Queue 的管道、喂料线程和 pickle 开销。
+    """
+
+    def __init__(self, task_ids=()):
+        self._idle = deque(task_ids)
+        self._cond = threading.Condition()
+
+    def put(self, task_id):
+        with self._cond:
+            self._idle.append(task_id)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """取出一个空闲ID，超时返回 None"""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._idle, timeout):
+                return None
+            return self._idle.popleft()
+
+    def qsize(self):
+        return len(self._idle)
+
+
+class TaskPathMap:
+    """任务ID到图片路径的映射，派发线程写入、回调线程读取和删除，统一加锁"""
+
+    def __init__(self):
+        self._paths = {}
+        self._lock = threading.Lock()
+
+    def __setitem__(self, task_id, pic_path):
+        with self._lock:
+            self._paths[task_id] = pic_path
+
+    def __getitem__(self, task_id):
+        with self._lock:
+            return self._paths[task_id]
+
+    def get(self, task_id, default=None):
+        with self._lock:
+            return self._paths.get(task_id, default)
+
+    def pop(self, task_id, default=None):
+        with self._lock:
+            return self._paths.pop(task_id, default)
+
+
+class ConnectState:
+    """替代 multiprocessing.Value('b') 的连接状态，读写 .value 与原实现兼容，wait() 阻塞等待连接"""
+
+    def __init__(self):
+        self._value = False
+        self._cond = threading.Condition()
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, connected):
+        with self._cond:
+            self._value = bool(connected)
+            self._cond.notify_all()
+
+    def wait(self, timeout=None):
+        """等待直到已连接，超时返回 False"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._value, timeout)
+
+
+class EngineProcess(OcrManager or object):
+    """可以同时存在多个实例的 OcrManager
+
+    原始 OcrManager 的任务ID队列、路径映射和连接状态都是类属性，第二个实例会与第一个共享
+    （甚至在填充任务ID时阻塞），这里改为每个实例独立持有，并在连接状态变化时通知监管者。
+    这些状态只在本进程的线程间共享，因此用 TaskIdPool/TaskPathMap/ConnectState 替代
+    multiprocessing 的 Queue 和 Value。
+    """
+
+    def __init__(self, lib_dir, on_connect_change=None, connect_timeout=30.0):
+        self.m_task_id = TaskIdPool()  # 由 OcrManager.__init__ 填入 1..OCR_MAX_TASK_ID
+        self.m_id_path = TaskPathMap()
+        self.m_connect_state = ConnectState()
+        self.m_switch_native = {}
+        self.m_callbacks = {}
+        self._on_connect_change = on_connect_change
+        self._connect_timeout = connect_timeout
+        super().__init__(lib_dir)
+
+    def SetConnectState(self, connect):
+        super().SetConnectState(connect)
+        if self._on_connect_change:
+            self._on_connect_change(self, bool(connect))
+
+    def GetIdleTaskId(self):
+        return self.m_task_id.get(timeout=1)
+
+    def SetTaskIdIdle(self, _id):
+        # 先删除路径再归还ID，ID被复用后迟到的回调不会对应到旧图片
+        self.m_id_path.pop(_id)
+        self.m_task_id.put(_id)
+
+    def DoOCRTask(self, pic_path):
+        """与原实现相同，但在条件变量上等待连接，而不是每秒轮询一次连接状态"""
+        if not self.m_wechatocr_running:
+            raise Exception("请先调用StartWeChatOCR启动")
+        if not os.path.exists(pic_path):
+            raise Exception(f"给定图片路径pic_path不存在: {pic_path}")
+        pic_path = os.path.abspath(pic_path)
+        if not self.m_connect_state.wait(self._connect_timeout):
+            raise Exception("等待Ocr服务连接超时")
+        _id = self.GetIdleTaskId()
+        if not _id:
+            # 原实现在 Queue 为空时抛出 queue.Empty；这里同样抛出，让监管者把任务重新排队而不是当作已发送
+            raise TaskIdUnavailable("当前没有空闲的任务ID")
+        self.SendOCRTask(_id, pic_path)
+
+    def IsConnected(self):
+        return bool(self.m_connect_state.value)
+
+    def FreeTaskIdCount(self):
+        return self.m_task_id.qsize()
+
+
+class FakeEngine:
+    """与 EngineProcess 接口一致的伪引擎，用于测试、基准和回放
+
+    result_func(pic_path) 返回识别结果字典，默认返回一条覆盖整张图片的 "fake" 文本；
+    每个任务的耗时为 latency + 图片百万像素数 * latency_per_mpx。
+    与 OcrManager 一样，任务ID在结果回调返回之后才归还，取不到空闲ID时等待 1 秒后放弃。
+    """
+
+    def __init__(self, lib_dir="", on_connect_change=None, latency=0.05, startup=0.1, result_func=None,
+                 latency_per_mpx=0.0):
+        self._on_connect_change = on_connect_change
+        self.latency = latency
+        self.latency_per_mpx = latency_per_mpx
+        self.startup = startup
+        self.result_func = result_func or self._default_result
+        self._callback = None
+        self._connected = False
+        self._running = False
+        self._task_ids = TaskIdPool(range(1, OCR_MAX_TASK_ID + 1))
+
+    @staticmethod
+    def _default_result(pic_path):
+        from PIL import Image
+        with Image.open(pic_path) as image:
+            width, height = image.size
+        return {"ocrResult": [{"text": "fake", "location": {"left": 0, "top": 0, "right": width, "bottom": height}}]}
+
+    def SetExePath(self, exe_path):
+        pass
+
+    def SetUsrLibDir(self, lib_dir):
+        pass
+
+    def SetOcrResultCallback(self, func):
+        self._callback = func
+
+    def StartWeChatOCR(self):
+        self._running = True
+        time.sleep(self.startup)
+        if self._running:
+            self._set_connected(True)
+
+    def KillWeChatOCR(self):
+        self._running = False
+        self._set_connected(False)
+
+    def crash(self):
+        """模拟引擎进程崩溃：连接断开，未完成的任务不再回调"""
+        self._running = False
+        self._set_connected(False)
+
+    def _set_connected(self, connected):
+        if self._connected == connected:
+            return
+        self._connected = connected
+        if self._on_connect_change:
+            self._on_connect_change(self, connected)
+
+    def IsConnected(self):
+        return self._connected
+
+    def FreeTaskIdCount(self):
+        return self._task_ids.qsize()
+
+    def DoOCRTask(self, pic_path):
+        if not self._running:
+            raise Exception("请先调用StartWeChatOCR启动")
+        task_id = self._task_ids.get(timeout=1)
+        if task_id is None:
+            raise TaskIdUnavailable("当前没有空闲的任务ID")
+        results = self.result_func(pic_path)
+        latency = self.latency
+        if self.latency_per_mpx:
+            from PIL import Image
+            with Image.open(pic_path) as image:
+                latency += image.width * image.height / 1e6 * self.latency_per_mpx
+        timer = threading.Timer(latency, self._complete, args=(task_id, pic_path, results))
+        timer.daemon = True
+        timer.start()
+
+    def _complete(self, task_id, pic_path, results):
+        try:
+            if self._running and self._callback:
+                self._callback(pic_path, results)
+        finally:
+            self._task_ids.put(task_id)
+
+
+def create_engine(exe_path, lib_dir, on_connect_change):
+    """默认的引擎工厂：创建并配置一个真实的 OCR 引擎进程"""
+    if not OcrManager:
+        raise RuntimeError("OCR依赖库 'wechat_ocr' 未安装。请参考项目说明进行安装。")
+    engine = EngineProcess(lib_dir, on_connect_change)
+    engine.SetExePath(exe_path)
+    engine.SetUsrLibDir(lib_dir)
+    return engine
+
+
+class OcrTask:
+    """一次提交给引擎的识别任务"""
+
+    def __init__(self, pic_path, speculative=False):
+        self.pic_path = pic_path
+        self.speculative = speculative  # 推测任务排在普通任务之后派发
+        self.engine = None
+        self.results = None
+        self._dispatched = threading.Event()
+        self._done = threading.Event()
+        self._callbacks_lock = threading.Lock()
+        self._callbacks = []
+
+    def mark_dispatched(self):
+        self._dispatched.set()
+
+    def mark_queued(self):
+        """引擎崩溃后任务重新排队"""
+        self.engine = None
+        self._dispatched.clear()
+
+    def set_result(self, results):
+        with self._callbacks_lock:
+            if self._done.is_set():
+                return
+            self.results = results
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def add_done_callback(self, callback):
+        """任务完成（包括因关闭而失败）时调用 callback(task)，在回调线程中执行；已完成时立即调用"""
+        with self._callbacks_lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, queue_timeout=None, ocr_timeout=None):
+        """先等待任务被派发（引擎启动、切换或重启期间任务会排队），再等待识别结果
+
+        任务因引擎崩溃重新排队时重新计时；超时返回 None。
+        """
+        while self._dispatched.wait(queue_timeout):
+            if self._done.wait(ocr_timeout):
+                return self.results
+            if self._dispatched.is_set():
+                break
+        return self.results if self.done() else None
+
+
+class EngineSupervisor:
+    """管理 OCR 引擎的生命周期：后台启动、热切换、崩溃后指数退避重启
+
+    引擎尚未连接（启动、切换或重启过程中）时提交的任务会排队，连接后由派发线程依次派发。
+    启动或重启的引擎在 connect_timeout 内没有连接（包括 StartWeChatOCR 抛出异常）时按崩溃处理。
+    连续失败次数只在引擎返回过结果或保持连接 stable_after 秒后清零，连上后很快又崩溃的引擎仍会退避；
+    backoff_max 应明显小于 ocr_client.QUEUE_TIMEOUT，否则排队的任务会在等待重启时超时。
+    """
+
+    def __init__(self, engine_factory=create_engine, backoff_base=1.0, backoff_max=20.0,
+                 connect_timeout=30.0, drain_timeout=10.0, stable_after=30.0):
+        self.engine_factory = engine_factory
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.drain_timeout = drain_timeout
+        self.stable_after = stable_after
+
+        self._lock = threading.Condition()
+        self._engine = None
+        self._config = None          # (exe_path, lib_dir)
+        self._pending = deque()      # 等待派发的 OcrTask
+        self._tasks = {}             # {pic_path: OcrTask}，已派发未完成
+        self._cancelled = {}         # {pic_path: OcrTask}，已派发后被取消、结果尚未回调，仍占用引擎的任务ID
+        self._failures = 0
+        self._connected_at = None    # 当前引擎连接上的时间（time.monotonic）
+        self._restart_timer = None
+        self._watchdog = None        # 当前引擎的连接看门狗
+        self._stopped = True
+        self._dispatcher = None      # 派发线程，停止后退出
+        self._id_starved = False     # 引擎取不到空闲ID，等下一个结果回调后再派发
+
+    # --- 生命周期 ---
+    def is_running(self):
+        return not self._stopped
+
+    def config(self):
+        return self._config
+
+    def start(self, exe_path, lib_dir):
+        """启动引擎，已在运行时直接返回 True；创建失败返回 False"""
+        with self._lock:
+            if not self._stopped:
+                return True
+            try:
+                engine = self._create(exe_path, lib_dir)
+            except Exception as e:
+                logging.error(f"OCR引擎初始化失败: {e}", exc_info=True)
+                return False
+            self._config = (exe_path, lib_dir)
+            self._engine = engine
+            self._stopped = False
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name="OcrDispatcher", daemon=True)
+                self._dispatcher.start()
+        self._launch(engine)
+        return True
+
+    def swap(self, exe_path, lib_dir):
+        """在后台启动新引擎，连接成功后原子切换，并等待旧引擎上的任务完成后关闭它"""
+        if self._stopped:
+            return self.start(exe_path, lib_dir)
+        threading.Thread(target=self._swap, args=(exe_path, lib_dir), daemon=True).start()
+        return True
+
+    def shutdown(self):
+        with self._lock:
+            self._stopped = True
+            if self._restart_timer:
+                self._restart_timer.cancel()
+                self._restart_timer = None
+            self._cancel_watchdog()
+            engine, self._engine = self._engine, None
+            self._connected_at = None
+            abandoned = list(self._pending) + list(self._tasks.values())
+            self._pending.clear()
+            self._tasks.clear()
+            self._cancelled.clear()
+            self._lock.notify_all()
+        for task in abandoned:
+            task.mark_dispatched()
+            task.set_result(None)
+        if engine:
+            self._kill(engine)
+
+    def _create(self, exe_path, lib_dir):
+        engine = self.engine_factory(exe_path, lib_dir, self._on_connect_change)
+        engine.SetOcrResultCallback(self._on_result)
+        return engine
+
+    def _launch(self, engine, watchdog=True):
+        """在后台线程中启动引擎；watchdog=True 时，引擎未能在 connect_timeout 内连接则按崩溃处理并重启"""
+        if watchdog:
+            with self._lock:
+                self._cancel_watchdog()
+                self._watchdog = threading.Timer(self.connect_timeout, self._engine_failed,
+                                                 args=(engine, f"OCR引擎未能在 {self.connect_timeout:g} 秒内连接"))
+                self._watchdog.daemon = True
+                self._watchdog.start()
+        threading.Thread(target=self._start_engine, args=(engine,), daemon=True).start()
+        logging.debug("OCR引擎启动线程已开始。")
+
+    def _start_engine(self, engine):
+        try:
+            # StartWeChatOCR 是 wechat_ocr 库中的硬编码方法名，这里无法更改
+            engine.StartWeChatOCR()
+        except Exception as e:
+            logging.error(f"OCR引擎启动失败: {e}", exc_info=True)
+            self._engine_failed(engine, "OCR引擎启动失败")
+
+    def _cancel_watchdog(self):
+        """在持有锁时调用"""
+        if self._watchdog:
+            self._watchdog.cancel()
+            self._watchdog = None
+
+    def _kill(self, engine):
+        try:
+            # KillWeChatOCR 是 wechat_ocr 库中的硬编码方法名，这里无法更改
+            engine.KillWeChatOCR()
+        except Exception as e:
+            logging.warning(f"关闭OCR引擎时出错: {e}")
+
+    def _swap(self, exe_path, lib_dir):
+        logging.info("正在后台启动新的OCR引擎...")
+        try:
+            new_engine = self._create(exe_path, lib_dir)
+        except Exception as e:
+            logging.error(f"新的OCR引擎初始化失败，继续使用当前引擎: {e}", exc_info=True)
+            return
+        self._launch(new_engine, watchdog=False)  # 下面自行等待连接，超时则放弃新引擎
+
+        with self._lock:
+            deadline = time.monotonic() + self.connect_timeout
+            while not new_engine.IsConnected() and not self._stopped:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._lock.wait(remaining)
+            if self._stopped or not new_engine.IsConnected():
+                logging.error("新的OCR引擎未能在规定时间内连接，继续使用当前引擎。")
+                abandon = True
+            else:
+                abandon = False
+                old_engine, self._engine = self._engine, new_engine
+                self._config = (exe_path, lib_dir)
+                self._connected_at = time.monotonic()
+                self._id_starved = False
+                self._lock.notify_all()
+        if abandon:
+            self._kill(new_engine)
+            return
+        logging.info("已切换到新的OCR引擎，等待旧引擎上的任务完成...")
+
+        with self._lock:
+            deadline = time.monotonic() + self.drain_timeout
+            while any(task.engine is old_engine for task in self._tasks.values()):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    logging.warning("旧引擎上仍有未完成的任务，强制关闭。")
+                    break
+                self._lock.wait(remaining)
+            self._forget_cancelled(old_engine)
+        if old_engine:
+            self._kill(old_engine)
+        logging.info("旧的OCR引擎已关闭。")
+
+    # --- 连接状态与崩溃恢复 ---
+    def _on_connect_change(self, engine, connected):
+        with self._lock:
+            self._lock.notify_all()
+            if engine is not self._engine or self._stopped:
+                return
+            if connected:
+                logging.info("OCR引擎已连接。")
+                self._connected_at = time.monotonic()
+                self._id_starved = False
+                self._cancel_watchdog()
+                return
+        with self._lock:
+            if engine is not self._engine or self._stopped:
+                return
+            # 当前引擎意外断开：把它上面未完成的任务放回队列，稍后重启
+            lost = [task for task in self._tasks.values() if task.engine is engine]
+            for task in lost:
+                del self._tasks[task.pic_path]
+                task.mark_queued()
+            self._pending.extendleft(reversed(lost))
+            self._forget_cancelled(engine)
+            self._engine = None
+            if self._connected_at is not None and time.monotonic() - self._connected_at >= self.stable_after:
+                self._failures = 0  # 稳定运行过一段时间，这次断开不算连续失败
+            self._connected_at = None
+            self._schedule_restart(engine, "OCR引擎连接断开")
+
+    def _engine_failed(self, engine, reason):
+        """当前引擎启动失败或迟迟没有连接：与崩溃一样放弃它，指数退避后重启"""
+        with self._lock:
+            if engine is not self._engine or self._stopped or engine.IsConnected():
+                return
+            self._watchdog = None
+            self._engine = None
+            self._schedule_restart(engine, reason)
+
+    def _schedule_restart(self, failed_engine, reason):
+        """在持有锁时调用：记一次失败，按指数退避安排重启"""
+        self._failures += 1
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (self._failures - 1))
+        logging.error(f"{reason}，{delay:.1f} 秒后尝试第 {self._failures} 次重启。")
+        metrics.incr("engine.restarts")
+        self._restart_timer = threading.Timer(delay, self._restart, args=(failed_engine,))
+        self._restart_timer.daemon = True
+        self._restart_timer.start()
+
+    def _restart(self, crashed_engine):
+        threading.Thread(target=self._kill, args=(crashed_engine,), daemon=True).start()
+        with self._lock:
+            self._restart_timer = None
+            if self._stopped or self._engine is not None:
+                return
+            try:
+                engine = self._create(*self._config)
+            except Exception as e:
+                self._schedule_restart(crashed_engine, f"重启OCR引擎失败: {e}")
+                return
+            self._engine = engine
+        self._launch(engine)
+
+    # --- 任务派发 ---
+    def submit(self, pic_path, speculative=False):
+        """提交一张图片，返回 OcrTask；引擎未就绪时任务排队
+
+        speculative=True 的推测任务不会挡住普通任务：普通任务插到排队中的第一个推测任务之前。
+        """
+        task = OcrTask(os.path.abspath(pic_path), speculative)
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("OCR引擎未运行")
+            position = len(self._pending)
+            if not speculative:
+                position = next((i for i, queued in enumerate(self._pending) if queued.speculative), position)
+            self._pending.insert(position, task)
+            self._lock.notify_all()
+        return task
+
+    def cancel(self, task):
+        """放弃一个任务（例如等待超时），结果到达时将被忽略
+
+        已派发的任务仍占用引擎的一个任务ID，直到其结果回调到达，因此继续计入引擎的负载。
+        """
+        with self._lock:
+            if task in self._pending:
+                self._pending.remove(task)
+            if self._tasks.get(task.pic_path) is task:
+                del self._tasks[task.pic_path]
+                self._cancelled[task.pic_path] = task
+            self._lock.notify_all()
+
+    def _forget_cancelled(self, engine):
+        """在持有锁时调用：引擎已断开或关闭，其上已取消任务的ID不会再归还"""
+        for pic_path in [path for path, task in self._cancelled.items() if task.engine is engine]:
+            del self._cancelled[pic_path]
+
+    def _dispatch_loop(self):
+        """派发线程：有排队任务且引擎可以接收时派发，否则在条件变量上等待，不轮询
+
+        DoOCRTask 取不到空闲任务ID时会阻塞，而 OcrManager 在结果回调返回之后才归还ID，
+        因此不能在回调线程中派发：满载时回调线程会等待一个只有它返回后才会归还的ID。
+        """
+        while True:
+            with self._lock:
+                batch = self._take_dispatchable()
+                while not batch and not self._stopped:
+                    self._lock.wait()
+                    batch = self._take_dispatchable()
+                if self._stopped:
+                    self._dispatcher = None
+                    return
+            self._dispatch(batch)
+
+    def _take_dispatchable(self):
+        """在持有锁时调用：取出可以派发给当前引擎的排队任务，不超过引擎的任务ID数量"""
+        engine = self._engine
+        batch = []
+        if engine is None or not engine.IsConnected() or self._id_starved:
+            return batch
+        busy = sum(1 for tasks in (self._tasks, self._cancelled) for task in tasks.values() if task.engine is engine)
+        while self._pending and busy < OCR_MAX_TASK_ID:
+            task = self._pending.popleft()
+            task.engine = engine
+            task.mark_dispatched()
+            self._tasks[task.pic_path] = task
+            batch.append(task)
+            busy += 1
+        return batch
+
+    def _dispatch(self, batch):
+        """在派发线程中、锁外调用：DoOCRTask 可能短暂阻塞"""
+        for i, task in enumerate(batch):
+            try:
+                task.engine.DoOCRTask(task.pic_path)
+            except TaskIdUnavailable:
+                # 引擎的ID都被占用（例如被已取消但未回调的任务占用）：其余任务放回队首，等结果回调归还ID
+                logging.warning("OCR引擎没有空闲的任务ID，任务重新排队。")
+                with self._lock:
+                    requeued = [t for t in batch[i:] if self._tasks.get(t.pic_path) is t]
+                    for t in batch[i:]:
+                        self._cancelled.pop(t.pic_path, None)  # 未发送出去，不占用任务ID
+                    for t in requeued:
+                        del self._tasks[t.pic_path]
+                        t.mark_queued()
+                    self._pending.extendleft(reversed(requeued))
+                    self._id_starved = True
+                return
+            except Exception as e:
+                logging.error(f"提交OCR任务失败: {e}")
+                with self._lock:
+                    if self._tasks.get(task.pic_path) is task:
+                        del self._tasks[task.pic_path]
+                    self._cancelled.pop(task.pic_path, None)
+                    self._lock.notify_all()
+                task.set_result(None)
+
+    def _on_result(self, pic_path, results):
+        """在引擎的回调线程中调用：只记录结果并唤醒派发线程，不在这里派发"""
+        with self._lock:
+            pic_path = os.path.abspath(pic_path)
+            task = self._tasks.pop(pic_path, None)
+            self._cancelled.pop(pic_path, None)
+            if task and task.engine is self._engine:
+                self._failures = 0  # 当前引擎能正常返回结果
+            self._id_starved = False
+            self._lock.notify_all()
+        if task:
+            task.set_result(results)
+
+    def register_gauges(self):
+        """把排队任务数和空闲任务ID数注册为全局指标，供状态页显示
+
+        指标注册表是进程全局的，只应由托盘程序自己的引擎调用；嵌入其他程序的客户端不注册，
+        以免覆盖程序的指标，也避免注册表一直持有其监管者。
+        """
+        metrics.register_gauge("ocr.queued", self.queued_count)
+        metrics.register_gauge("engine.free_task_ids", self.free_task_ids)
+
+    def queued_count(self):
+        return len(self._pending)
+
+    def free_task_ids(self):
+        engine = self._engine
+        return engine.FreeTaskIdCount() if engine else None
@@ -2,17 +2,11 @@ import logging
 import os
 import sys
 import pyperclip
-import threading
-import queue
+import time
+from PIL import Image
 
-# 动态导入，避免硬编码
-try:
-    from wechat_ocr.ocr_manager import OcrManager
-except ImportError:
-    OcrManager = None
-
-ocr_manager_instance = None
-result_queue = queue.Queue()
+from metrics import metrics
+from ocr_client import OcrClient
 
 
 def get_resource_path(relative_path):
@@ -23,89 +17,92 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 
-def ocr_result_callback(img_path: str, results: dict):
-    """当OCR完成时，外部引擎会调用此函数"""
-    logging.debug(f"OCR回调触发: {img_path}")
-    if results and results.get('ocrResult'):
-        ocr_text = "\n".join([item['text'] for item in results['ocrResult']])
-        result_queue.put(ocr_text)
-    else:
-        result_queue.put("")
-
-
-def setup_ocr_manager(engine_exe_path: str, lib_dir: str) -> bool:
-    """初始化并启动外部OCR引擎服务"""
-    global ocr_manager_instance
-    if ocr_manager_instance: return True
-    
-    if not OcrManager:
-        logging.error("OCR依赖库 'wechat_ocr' 未安装。请参考项目说明进行安装。")
-        return False
-
-    try:
-        logging.debug("正在初始化 OcrManager...")
-        ocr_manager_instance = OcrManager(lib_dir)
-        ocr_manager_instance.SetExePath(engine_exe_path)
-        ocr_manager_instance.SetUsrLibDir(lib_dir)
-        ocr_manager_instance.SetOcrResultCallback(ocr_result_callback)
-        # StartWeChatOCR 是 wechat_ocr 库中的硬编码方法名，这里无法更改
-        threading.Thread(target=ocr_manager_instance.StartWeChatOCR, daemon=True).start()
-        logging.debug("OcrManager 初始化线程已启动。")
-        return True
-    except Exception as e:
-        logging.error(f"OcrManager 初始化失败: {e}", exc_info=True)
-        ocr_manager_instance = None
-        return False
-
-
-def shutdown_ocr_manager():
-    """关闭外部OCR引擎服务"""
-    global ocr_manager_instance
-    if ocr_manager_instance:
-        logging.debug("正在关闭 OcrManager...")
-        # KillWeChatOCR 是 wechat_ocr 库中的硬编码方法名，这里无法更改
-        ocr_manager_instance.KillWeChatOCR()
-        ocr_manager_instance = None
-        logging.debug("OcrManager 已关闭。")
-
-
-def perform_ocr_on_image(image):
-    """在一个后台线程中对给定的图像执行OCR"""
-    if not ocr_manager_instance or not image:
+# 全局单例，托盘程序的所有识别都经过它；引擎的启动、热切换和崩溃重启由其 supervisor 负责
+ocr_client = OcrClient(temp_dir=get_resource_path(""))
+
+
+def _copy_text(ocr_text):
+    with metrics.timer("stage.clipboard"):
+        pyperclip.copy(ocr_text)
+    logging.info("OCR 结果已复制到剪贴板。")
+    # 将识别内容记录在DEBUG级别，只有在详细模式下显示
+    logging.debug(f"识别内容:\n---\n{ocr_text}\n---")
+
+
+def perform_ocr_on_image(image, copy_to_clipboard=True, client=None):
+    """在一个后台线程中对给定的图像执行OCR，返回识别文本；失败或超时返回 None
+
+    client 默认为全局 ocr_client，其预处理和后处理选项作用于本次识别。
+    """
+    client = client or ocr_client
+    if not client.is_running() or not image:
         logging.error("OCR引擎未运行或图像无效，无法执行识别。")
-        return
+        return None
 
-    temp_path = get_resource_path("temp_screenshot.png")
+    ocr_text = client.ocr(image).text
+    if ocr_text and copy_to_clipboard:
+        _copy_text(ocr_text)
+    elif ocr_text == "":
+        logging.info("未识别到任何文字。")
+    return ocr_text
 
-    try:
-        image.save(temp_path)
-        screenshot_file = temp_path
-    except Exception as e:
-        logging.error(f"保存临时截图文件失败: {e}", exc_info=True)
-        return
 
-    while not result_queue.empty():
-        result_queue.get_nowait()
-
-    logging.debug(f"正在提交OCR任务: {screenshot_file}")
-    ocr_manager_instance.DoOCRTask(screenshot_file)
-
-    try:
-        # 等待最多10秒获取结果
-        ocr_text = result_queue.get(timeout=10)
-        if ocr_text:
-            pyperclip.copy(ocr_text)
-            logging.info("OCR 结果已复制到剪贴板。")
-            # 将识别内容记录在DEBUG级别，只有在详细模式下显示
-            logging.debug(f"识别内容:\n---\n{ocr_text}\n---")
-        else:
-            logging.info("未识别到任何文字。")
-    except queue.Empty:
-        logging.warning("OCR 任务超时！未在10秒内收到回调结果。")
-    finally:
-        # 确保能删除临时文件
-        if os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-            except OSError as e:
-                print(f"删除临时文件失败: {e}")
+def perform_ocr_on_images(images, copy_to_clipboard=True, client=None, boxes=None, speculator=None):
+    """同时识别多张图像，返回与 images 一一对应的文本列表（失败或超时为 None）
+
+    由 client.map 并行识别，每张图像的文本分别做后处理，非空结果按 images 的顺序以空行分隔合并后
+    一次性复制到剪贴板。传入 SpeculativeOcr 和各图像的全局坐标 boxes 时，被推测任务覆盖的选区
+    直接使用推测结果，推测结果不可用时退回正常识别；结束后取消其余推测任务。
+    """
+    client = client or ocr_client
+    if not client.is_running() or not images:
+        logging.error("OCR引擎未运行或图像无效，无法执行识别。")
+        if speculator:
+            speculator.close()
+        return [None] * len(images)
+
+    ocr_start = time.perf_counter()
+    claimed = [None] * len(images)
+    if speculator and boxes:
+        claimed = [speculator.claim(box) for box in boxes]
+    if speculator:
+        speculator.close()
+    fresh = [i for i, entry in enumerate(claimed) if entry is None]
+
+    texts = [None] * len(images)
+    for result in client.map([images[i] for i in fresh]):
+        texts[fresh[result.index]] = result.text
+        if speculator:
+            metrics.incr("cache.miss")
+    for i, entry in enumerate(claimed):
+        if entry is None:
+            continue
+        result = speculator.result(entry, boxes[i], ocr_start)
+        metrics.incr("cache.hit" if result is not None else "cache.miss")
+        texts[i] = (result or client.ocr(images[i])).text
+
+    combined = "\n\n".join(text for text in texts if text)
+    if combined and copy_to_clipboard:
+        _copy_text(combined)
+        if len(images) > 1:
+            logging.info(f"已合并 {sum(1 for text in texts if text)}/{len(images)} 张图像的识别结果。")
+    elif not combined:
+        logging.info("未识别到任何文字。")
+    return texts
+
+
+def perform_ocr_on_files(paths, client=None):
+    """同时识别多个图片文件，合并结果后一次性复制到剪贴板"""
+    images = []
+    for path in paths:
+        try:
+            with Image.open(path) as image:
+                image.load()
+        except OSError as e:
+            logging.error(f"无法打开图片 {path}: {e}")
+            continue
+        images.append(image)
+    if not images:
+        logging.info("未识别到任何文字。")
+        return
+    perform_ocr_on_images(images, client=client)
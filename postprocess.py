@@ -0,0 +1,122 @@
+import logging
+import re
+
+# 中日文字符：平假名/片假名、CJK 扩展A、CJK 基本区、兼容汉字
+_CJK = r"぀-ヿ㐀-䶿一-鿿豈-﫿"
+
+# 行尾连字符：以字面量 "-" 开头，正则引擎可以直接跳到候选位置，再用后顾断言检查前一个字母
+_HYPHEN = re.compile(r"-(?<=[A-Za-z]-)\n(?=[a-z])")
+# 中日文与英文/数字相邻处：两个方向合并为一个正则，一遍完成
+_SPACING = re.compile(rf"[{_CJK}](?=[A-Za-z0-9])|[A-Za-z0-9](?=[{_CJK}])")
+
+_REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+class PostprocessOptions:
+    """识别文本的后处理选项"""
+
+    def __init__(self, halfwidth=True, halfwidth_punctuation=False, merge_hyphens=False, cjk_spacing=False,
+                 rules=()):
+        self.halfwidth = halfwidth                          # 全角字母、数字、空格转半角
+        self.halfwidth_punctuation = halfwidth_punctuation  # 全角标点也转为 ASCII 标点
+        self.merge_hyphens = merge_hyphens                  # 合并行尾连字符断开的英文单词（复合词的连字符也会被去掉）
+        self.cjk_spacing = cjk_spacing                      # 在中日文与英文/数字之间加空格
+        self.rules = list(rules)                            # 自定义规则 [(正则, 替换文本)]，按顺序应用
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(halfwidth=config.get("text_halfwidth", True),
+                   halfwidth_punctuation=config.get("text_halfwidth_punctuation", False),
+                   merge_hyphens=config.get("text_merge_hyphens", False),
+                   cjk_spacing=config.get("text_cjk_spacing", False),
+                   rules=_rules_from_config(config.get("text_rules", [])))
+
+    def enabled(self):
+        return self.halfwidth or self.halfwidth_punctuation or self.merge_hyphens or self.cjk_spacing or bool(self.rules)
+
+
+def _rules_from_config(entries):
+    """读取配置中的 text_rules，格式不对的条目记录警告后跳过，不影响程序启动"""
+    if not isinstance(entries, list):
+        logging.warning(f"忽略无效的 text_rules 配置 {entries!r}: 应为规则列表")
+        return []
+    rules = []
+    for rule in entries:
+        if (not isinstance(rule, dict) or not isinstance(rule.get("pattern", ""), str)
+                or not isinstance(rule.get("replace", ""), str)):
+            logging.warning(f"忽略无效的文本替换规则 {rule!r}: 应为 {{\"pattern\": 正则, \"replace\": 替换文本}}")
+            continue
+        if rule.get("pattern"):
+            rules.append((rule["pattern"], rule.get("replace", "")))
+    return rules
+
+
+def _halfwidth_pairs(options):
+    """全角转半角的 (全角, 半角) 替换对"""
+    codes = []
+    if options.halfwidth:
+        codes += [*range(0xFF10, 0xFF1A), *range(0xFF21, 0xFF3B), *range(0xFF41, 0xFF5B)]
+    if options.halfwidth_punctuation:
+        codes += [code for code in range(0xFF01, 0xFF5F) if code not in set(codes)]
+    pairs = [(chr(code), chr(code - 0xFEE0)) for code in codes]
+    if options.halfwidth:
+        pairs.append(("　", " "))
+    return pairs
+
+
+def _is_literal(pattern):
+    return not _REGEX_METACHARACTERS.intersection(pattern)
+
+
+class TextPostprocessor:
+    """把启用的后处理规则编译为一组步骤，每个步骤选用 CPython 中最快的实现
+
+    实测 CPython 的正则引擎对合并后的交替正则没有首字符快速跳过，合并反而比分开更慢；
+    str.translate 对非 ASCII 文本逐字符查表，也比对几十个全角字符逐一 str.replace 慢。因此：
+    全角转半角为一串预先生成的 str.replace；连字符规则以字面量开头；两个方向的中英文加空格合并为一遍；
+    纯字面量的自定义规则用 str.replace，其余用预编译正则。纯 ASCII 文本（str.isascii 为 O(1)）
+    直接跳过全角转换和加空格，不含 "-\\n" 的文本跳过连字符合并。
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self._steps = []  # [callable(text) -> text]
+
+        pairs = _halfwidth_pairs(options)
+        if pairs:
+            self._steps.append(lambda text: text if text.isascii() else self._replace_all(text, pairs))
+        if options.merge_hyphens:
+            self._steps.append(lambda text: _HYPHEN.sub("", text) if "-\n" in text else text)
+        if options.cjk_spacing:
+            self._steps.append(lambda text: text if text.isascii() else _SPACING.sub(_add_space, text))
+        for pattern, replacement in options.rules:
+            if _is_literal(pattern) and "\\" not in replacement:
+                self._steps.append(lambda text, old=pattern, new=replacement: text.replace(old, new))
+                continue
+            try:
+                compiled = re.compile(pattern)
+            except re.error as e:
+                logging.warning(f"忽略无效的文本替换规则 {pattern!r}: {e}")
+                continue
+            self._steps.append(lambda text, compiled=compiled, replacement=replacement: compiled.sub(replacement, text))
+
+    @staticmethod
+    def _replace_all(text, pairs):
+        for old, new in pairs:
+            text = text.replace(old, new)
+        return text
+
+    def __call__(self, text):
+        if not text:
+            return text
+        for step in self._steps:
+            text = step(text)
+        return text
+
+    def passes(self):
+        """处理一段文本最多需要的遍数"""
+        return len(self._steps)
+
+
+def _add_space(match):
+    return match.group() + " "
@@ -0,0 +1,158 @@
+from PIL import Image, ImageChops
+
+
+class PreprocessOptions:
+    """OCR 前的预处理选项"""
+
+    def __init__(self, trim_margins=True, rescale=True, grayscale=False,
+                 min_line_height=20, max_line_height=64, min_scale=0.5, max_scale=3.0, max_side=4096,
+                 max_foreground=0.5, tolerance=24, padding=6):
+        self.trim_margins = trim_margins
+        self.rescale = rescale
+        self.grayscale = grayscale
+        self.min_line_height = min_line_height  # 估计行高低于该值时放大
+        self.max_line_height = max_line_height  # 估计行高高于该值时缩小
+        self.min_scale = min_scale              # 缩放倍数的下限
+        self.max_scale = max_scale              # 缩放倍数的上限
+        self.max_side = max_side                # 放大后的最长边上限
+        self.max_foreground = max_foreground    # 前景占比超过该值时不缩放（多半不是白底文字）
+        self.tolerance = tolerance              # 与背景色的差异超过该值视为前景
+        self.padding = padding                  # 裁剪后保留的边距
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(trim_margins=config.get("ocr_trim_margins", True),
+                   rescale=config.get("ocr_rescale", True),
+                   grayscale=config.get("ocr_grayscale", False))
+
+    def enabled(self):
+        return self.trim_margins or self.rescale or self.grayscale
+
+
+class CropTransform:
+    """记录预处理对坐标的变换，用于把识别结果中的 location 映射回原图坐标"""
+
+    def __init__(self, offset=(0, 0), scale=1.0):
+        self.offset = offset
+        self.scale = scale
+
+    def map_location(self, location):
+        left, top = self.offset
+        s = self.scale
+        return {
+            "left": location.get("left", 0) / s + left,
+            "top": location.get("top", 0) / s + top,
+            "right": location.get("right", 0) / s + left,
+            "bottom": location.get("bottom", 0) / s + top,
+        }
+
+    def map_results(self, results):
+        """原地映射识别结果中每一项的 location"""
+        if not results or (self.offset == (0, 0) and self.scale == 1.0):
+            return results
+        for item in results.get("ocrResult", []):
+            if item.get("location"):
+                item["location"] = self.map_location(item["location"])
+        return results
+
+
+def _border_strip(image):
+    """把四条边上的像素拼成一行"""
+    width, height = image.size
+    strip = Image.new(image.mode, (2 * width + 2 * height, 1))
+    strip.paste(image.crop((0, 0, width, 1)), (0, 0))
+    strip.paste(image.crop((0, height - 1, width, height)), (width, 0))
+    strip.paste(image.crop((0, 0, 1, height)).transpose(Image.Transpose.TRANSPOSE), (2 * width, 0))
+    strip.paste(image.crop((width - 1, 0, width, height)).transpose(Image.Transpose.TRANSPOSE),
+                (2 * width + height, 0))
+    return strip
+
+
+def _background_color(image, tolerance):
+    """取整圈边缘上出现最多的颜色作为背景色
+
+    与该颜色相近的像素不足边缘的一半时（渐变、照片、噪点等非均匀背景）返回 None。
+    """
+    border = _border_strip(image)
+    _, color = max(border.getcolors(border.width))
+    diff = ImageChops.difference(border, Image.new(border.mode, border.size, color)).convert("L")
+    matched = diff.point(lambda v: 255 if v <= tolerance else 0).histogram()[255]
+    return color if matched * 2 >= border.width else None
+
+
+def _foreground_mask(image, background, tolerance):
+    diff = ImageChops.difference(image, Image.new(image.mode, image.size, background)).convert("L")
+    return diff.point(lambda v: 255 if v > tolerance else 0)
+
+
+def _row_profile(mask):
+    """行投影：把掩码水平压缩为一列，得到每行的前景占比（0-255），在 C 层完成
+
+    用浮点模式压缩，宽截图中只有几个前景像素的行不会被舍入为 0。
+    """
+    return list(mask.convert("F").resize((1, mask.height), Image.BOX).getdata())
+
+
+def estimate_line_height(rows):
+    """根据行投影中连续前景行的长度估计文字行高（中位数）
+
+    没有前景，或某一段连续前景占了一半以上的行（大块图形而不是文字行）时返回 None。
+    """
+    runs, run = [], 0
+    for value in rows:
+        if value:
+            run += 1
+        elif run:
+            runs.append(run)
+            run = 0
+    if run:
+        runs.append(run)
+    if not runs or max(runs) * 2 > len(rows):
+        return None
+    runs.sort()
+    return runs[len(runs) // 2]
+
+
+def preprocess_image(image, options):
+    """裁掉均匀背景边距并把文字缩放到引擎擅长的尺寸，返回 (处理后的图像, CropTransform)
+
+    背景不是单一颜色（渐变、照片等）时不裁剪也不缩放。
+    """
+    transform = CropTransform()
+    if not options.enabled() or image.width < 2 or image.height < 2:
+        return image, transform
+
+    rgb = image.convert("RGB") if image.mode not in ("RGB", "L") else image
+    background = _background_color(rgb, options.tolerance)
+    mask = _foreground_mask(rgb, background, options.tolerance) if background is not None else None
+
+    if options.trim_margins and mask is not None:
+        # 掩码的包围盒即行/列投影中首尾非空的位置
+        extent = mask.getbbox()
+        if extent:
+            pad = options.padding
+            box = (max(0, extent[0] - pad), max(0, extent[1] - pad),
+                   min(image.width, extent[2] + pad), min(image.height, extent[3] + pad))
+            if box != (0, 0, image.width, image.height):
+                rgb = rgb.crop(box)
+                mask = mask.crop(box)
+                transform.offset = (box[0], box[1])
+
+    if options.grayscale and rgb.mode != "L":
+        rgb = rgb.convert("L")
+
+    if options.rescale and mask is not None:
+        foreground = mask.histogram()[255] / (mask.width * mask.height)
+        line_height = estimate_line_height(_row_profile(mask)) if foreground <= options.max_foreground else None
+        scale = 1.0
+        if line_height and line_height < options.min_line_height:
+            scale = options.min_line_height / line_height
+        elif line_height and line_height > options.max_line_height:
+            scale = options.max_line_height / line_height
+        scale = max(options.min_scale, min(scale, options.max_scale, options.max_side / max(rgb.size)))
+        if abs(scale - 1.0) > 0.05:
+            size = (max(1, round(rgb.width * scale)), max(1, round(rgb.height * scale)))
+            rgb = rgb.resize(size, Image.LANCZOS if scale < 1 else Image.BICUBIC)
+            transform.scale = scale
+
+    return rgb, transform
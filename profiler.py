@@ -0,0 +1,150 @@
+import json
+import logging
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SamplingProfiler:
+    """覆盖所有线程的采样剖析器
+
+    cProfile 只能剖析调用它的线程，无法覆盖 Tk 主线程、热键消息循环、日志线程等已在运行的线程，
+    因此这里在独立线程中定期读取 sys._current_frames() 采样所有线程的调用栈。
+    结果同时写成 pstats 可读取的 .prof 文件和 speedscope 的 .speedscope.json 文件。
+    未启动时不存在采样线程，也不安装任何钩子，没有额外开销。
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._samples = Counter()  # {(线程名, (frame_key, ...)): 次数}，调用栈从外到内
+        self._weights = Counter()  # {同上: 秒数}，每个样本代表距上一次采样的实际时长
+        self._captures_left = None
+        self._output_base = None
+        self._started_at = None
+        self._deadline = None
+        self.on_finished = None    # 剖析结束并写出文件后调用，参数为写出的文件路径列表
+
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, output_base, seconds=None, captures=None):
+        """开始采样；达到 seconds 秒或 captures 次截图（先到者为准）后自动停止并写出文件"""
+        if self.is_running():
+            return False
+        self._samples = Counter()
+        self._weights = Counter()
+        self._captures_left = captures
+        self._output_base = output_base
+        self._deadline = time.monotonic() + seconds if seconds else None
+        self._stop_event.clear()
+        self._started_at = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+        self._thread.start()
+        logging.info(f"性能剖析已开始 (截图次数: {captures or '不限'}, 时长: {seconds or '不限'} 秒)")
+        return True
+
+    def note_capture(self):
+        """每完成一次截图识别调用一次，用于按截图次数停止"""
+        if not self.is_running() or self._captures_left is None:
+            return
+        with self._lock:
+            self._captures_left -= 1
+            finished = self._captures_left <= 0
+        if finished:
+            self._stop_event.set()
+
+    def stop(self):
+        """手动停止采样，文件由采样线程写出"""
+        self._stop_event.set()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop_event.wait(self.interval):
+            # 实际采样周期 = 等待 + 遍历所有线程调用栈 + 等待 GIL，明显长于 interval
+            now = time.perf_counter()
+            weight, last = now - last, now
+            if self._deadline and time.monotonic() >= self._deadline:
+                break
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                    frame = frame.f_back
+                stack.reverse()
+                key = (names.get(thread_id, str(thread_id)), tuple(stack))
+                self._samples[key] += 1
+                self._weights[key] += weight
+        self._write()
+
+    def _write(self):
+        elapsed = time.monotonic() - self._started_at
+        paths = [self._output_base + ".prof", self._output_base + ".speedscope.json"]
+        try:
+            self.write_pstats(paths[0])
+            self.write_speedscope(paths[1], elapsed)
+            logging.info(f"性能剖析已结束，共 {sum(self._samples.values())} 个样本，已写入: {', '.join(paths)}")
+        except OSError as e:
+            logging.error(f"写入性能剖析文件失败: {e}")
+            paths = []
+        if self.on_finished:
+            self.on_finished(paths)
+
+    def write_pstats(self, path):
+        """按 pstats 的格式写出: {func: (cc, nc, tt, ct, callers)}，时间为各样本实际采样周期之和"""
+        stats = {}
+        for key, count in self._samples.items():
+            stack, seconds = key[1], self._weights[key]
+            seen = set()
+            for depth, func in enumerate(stack):
+                cc, nc, tt, ct, callers = stats.get(func, (0, 0, 0.0, 0.0, {}))
+                if func not in seen:  # 递归调用只计一次累计时间
+                    seen.add(func)
+                    cc, nc, ct = cc + count, nc + count, ct + seconds
+                if depth == len(stack) - 1:
+                    tt += seconds
+                if depth > 0:
+                    caller = stack[depth - 1]
+                    c_cc, c_nc, c_tt, c_ct = callers.get(caller, (0, 0, 0.0, 0.0))
+                    callers[caller] = (c_cc + count, c_nc + count,
+                                       c_tt + (seconds if depth == len(stack) - 1 else 0.0), c_ct + seconds)
+                stats[func] = (cc, nc, tt, ct, callers)
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+    def write_speedscope(self, path, elapsed):
+        """按 speedscope 的 sampled 格式写出，每个线程一个 profile"""
+        frames, frame_index = [], {}
+        profiles = {}
+        for (thread_name, stack), seconds in self._weights.items():
+            indices = []
+            for func in stack:
+                if func not in frame_index:
+                    frame_index[func] = len(frames)
+                    frames.append({"name": func[2], "file": func[0], "line": func[1]})
+                indices.append(frame_index[func])
+            profile = profiles.setdefault(thread_name, {
+                "type": "sampled", "name": thread_name, "unit": "seconds",
+                "startValue": 0, "endValue": elapsed, "samples": [], "weights": [],
+            })
+            profile["samples"].append(indices)
+            profile["weights"].append(seconds)
+        document = {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": os.path.basename(self._output_base),
+            "exporter": "Ocr2Clip",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(document, f)
@@ -1,5 +1,13 @@
+import logging
+import threading
+import time
 import tkinter as tk
-from PIL import ImageGrab, ImageTk, ImageEnhance
+from PIL import ImageTk
+
+from capture_backend import CAPTURE_MODE_CURSOR, PilCaptureBackend
+from memory_trace import MemoryTracer
+from metrics import metrics
+from region_detect import block_at, detect_text_blocks
 
 
 class _Box:
@@ -24,77 +32,325 @@ class _Box:
                 max(self.start_x, self.end_x), max(self.start_y, self.end_y))
 
 
-class Screenshotter:
-    def __init__(self, master):
-        self.master = master
-        self.win = tk.Toplevel(master)
+BYTES_PER_PIXEL = 4  # PIL 与 Tk 内部均按每像素4字节存储 RGB 图像
+DEFAULT_MEMORY_BUDGET_MB = 768
+
+CONTROL_MASK = 0x0004  # Tk 事件 state 中的 Ctrl 键位
+SELECTION_BORDER = 2   # 选区绿色边框的宽度
+REGION_ORDER_SELECTION = "selection"  # 多选区结果按框选顺序合并
+REGION_ORDER_READING = "reading"      # 多选区结果按屏幕上从上到下、从左到右合并
+
+
+def prepare_overlay_background(image, logical_size):
+    """基于截图创建一个变暗的版本作为背景；缩放比例不为1时缩放到逻辑尺寸显示
+
+    使用查找表按通道减半亮度，只分配一个新缓冲区（ImageEnhance 需要额外的黑色底图）。
+    """
+    darkened_image = image.point(lambda v: v >> 1)  # 50%的亮度
+    if darkened_image.size != tuple(logical_size):
+        darkened_image = darkened_image.resize(tuple(logical_size))
+    return darkened_image
+
+
+def overlay_window_geometry(monitor):
+    """覆盖窗口的 Tk geometry 字符串
+
+    位置始终以 "+" 开头：Tk 把 "-x" 理解为到屏幕右/下边缘的距离，主显示器左侧或上方的显示器
+    坐标为负数，需要写成 "+-1920+0" 这样的形式。
+    """
+    x, y, width, height = monitor.overlay_geometry()
+    return f"{width}x{height}+{x}+{y}"
+
+
+def estimate_capture_bytes(monitors, backend):
+    """估算截取并显示这些显示器时的峰值内存
+
+    常驻部分：每个显示器的原始截图 + 背景 PhotoImage；
+    瞬时部分：backend 截图时的中间缓冲区、构建背景时的变暗副本或拖动时的选区 PhotoImage（覆盖窗口尺寸，
+    同一时刻只有一个），取其中最大的一个。
+    """
+    resident, transient = 0, 0
+    for monitor in monitors:
+        _, _, width, height = monitor.overlay_geometry()
+        resident += (monitor.width * monitor.height + width * height) * BYTES_PER_PIXEL
+        transient = max(transient, width * height * BYTES_PER_PIXEL, backend.grab_overhead_bytes(monitor))
+    return resident + transient
+
 
-        # --- 创建一个无边框、置顶的全屏窗口 ---
-        width = self.win.winfo_screenwidth()
-        height = self.win.winfo_screenheight()
-        self.win.geometry(f"{width}x{height}+0+0")
+def select_monitors_within_budget(monitors, budget_bytes, backend):
+    """按顺序保留能放入内存预算的显示器，第一个（鼠标所在显示器）始终保留"""
+    selected = monitors[:1]
+    for monitor in monitors[1:]:
+        if estimate_capture_bytes(selected + [monitor], backend) > budget_bytes:
+            logging.warning(f"截图内存预算不足，跳过显示器 {monitor}")
+            continue
+        selected.append(monitor)
+    return selected
+
+
+def grab_monitors(backend, mode, memory_budget_mb, tracer):
+    """依次截取 mode 选中、且能放入内存预算的显示器，逐个产出 (monitor, image)
+
+    只截取需要的显示器：默认仅鼠标所在显示器，截图开销与所用显示器成正比。
+    逐个产出，调用方处理完上一个显示器后才截取下一个。
+    """
+    monitors = select_monitors_within_budget(backend.select_monitors(mode), memory_budget_mb * 2**20, backend)
+    for monitor in monitors:
+        with metrics.timer("stage.grab"):
+            image = backend.grab(monitor)
+        tracer.snapshot("grab")
+        logging.debug(f"已截取显示器 {monitor}")
+        yield monitor, image
+
+
+class _MonitorOverlay:
+    """单个显示器上的无边框置顶覆盖窗口"""
+
+    def __init__(self, owner, monitor, image):
+        self.owner = owner
+        self.monitor = monitor
+        self.win = tk.Toplevel(owner.master)
+
+        # --- 按显示器在虚拟桌面中的坐标放置窗口（与截图同为物理像素） ---
+        _, _, width, height = monitor.overlay_geometry()
+        self.logical_size = (width, height)
+        self.win.geometry(overlay_window_geometry(monitor))
         self.win.overrideredirect(True)
         self.win.attributes('-topmost', True)
 
-        self.captured_image = None
+        # 该显示器的截图（物理像素）
+        self.full_screen_image = image
         self.selection_box = _Box()
 
-        # 程序启动时，立即截取一次全屏图像，保存在内存中。
-        self.full_screen_image = ImageGrab.grab()
-
-        # 基于上面的全屏图，创建一个变暗的版本作为背景。
-        enhancer = ImageEnhance.Brightness(self.full_screen_image)
-        self.darkened_image = enhancer.enhance(0.5)  # 50%的亮度
-
-        # 将变暗的图像显示在Canvas上
-        self.dark_photo = ImageTk.PhotoImage(self.darkened_image)
-        self.canvas = tk.Canvas(self.win, cursor='tcross')
+        # 将变暗的图像显示在Canvas上；Tk 已持有像素副本，PIL 中的变暗图随即释放
+        darkened_image = prepare_overlay_background(self.full_screen_image, self.logical_size)
+        self.dark_photo = ImageTk.PhotoImage(darkened_image)
+        del darkened_image
+        self.canvas = tk.Canvas(self.win, cursor='tcross', highlightthickness=0)
         self.canvas.pack(fill="both", expand=True)
         self.canvas.create_image(0, 0, image=self.dark_photo, anchor=tk.NW)
-        self.selection_photo = None
+        self.selection_photo = None  # 选区高亮图像，首次拖动时按覆盖窗口尺寸分配一次
+        self.selection_view = None   # 只显示 selection_photo 左上角选区大小部分的裁剪画布
+        self.selection_item = None   # selection_view 在遮罩画布上的窗口项，隐藏时为 None
+        self.region_photos = []  # 已确认选区的高亮图像，需保持引用
+        self.speculate_after_id = None
+
+        # 单击选取文字块：在后台线程中检测，覆盖窗口显示期间完成
+        self.text_blocks = None  # 逻辑坐标，检测完成前为 None
+        self.hover_block = None
+        if owner.click_select:
+            threading.Thread(target=self._detect_blocks, args=(image,), daemon=True).start()
 
         # 绑定事件
-        self.win.bind('<KeyPress-Escape>', self._on_cancel)
-        self.win.bind('<Button-3>', self._on_cancel)
+        self.win.bind('<KeyPress-Escape>', owner._on_cancel)
+        self.win.bind('<Button-3>', owner._on_cancel)
         self.win.bind('<ButtonPress-1>', self._on_mouse_press)
         self.win.bind('<B1-Motion>', self._on_mouse_drag)
         self.win.bind('<ButtonRelease-1>', self._on_mouse_release)
+        self.win.bind('<KeyPress-Return>', lambda event: owner._finish())
+        if owner.click_select:
+            self.win.bind('<Motion>', self._on_mouse_move)
+
+    def _detect_blocks(self, image):
+        start = time.perf_counter()
+        blocks = detect_text_blocks(image)
+        metrics.observe("stage.detect", time.perf_counter() - start)
+        self.text_blocks = [self.monitor.to_logical(b, self.logical_size) for b in blocks]
+        logging.debug(f"检测到 {len(blocks)} 个文字块，耗时 {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    def _on_mouse_move(self, event):
+        """鼠标悬停时高亮其下方的文字块，只在高亮块变化时重绘"""
+        if not self.text_blocks:
+            return
+        block = block_at(self.text_blocks, *self._canvas_point(event))
+        if block == self.hover_block:
+            return
+        self.hover_block = block
+        self.canvas.delete("hover_block")
+        if block:
+            self.canvas.create_rectangle(block, outline='#40a0ff', width=2, dash=(4, 2), tags="hover_block")
 
     def destroy(self):
-        """提供一个公共接口来销毁窗口"""
+        self._cancel_speculation()
         if self.win and self.win.winfo_exists():
             self.win.destroy()
+        # 释放截图和 Tk 图像，避免窗口关闭后仍占用内存
+        self.full_screen_image = None
+        self.dark_photo = None
+        self.selection_photo = None
+        self.selection_view = None
+        self.region_photos = []
 
-    def _on_cancel(self, event=None):
-        self.captured_image = None
-        self.destroy()  # 使用新的公共方法
+    def _canvas_point(self, event):
+        """事件在遮罩画布上的坐标；鼠标在选区上时事件来自 selection_view，需要加上它的位置"""
+        if self.selection_item is not None and event.widget is self.selection_view:
+            left, top = self.canvas.coords(self.selection_item)
+            return round(event.x + left), round(event.y + top)
+        return event.x, event.y
 
     def _on_mouse_press(self, event):
-        self.selection_box.set_start(event.x, event.y)
+        self.selection_box = _Box()
+        self.selection_box.set_start(*self._canvas_point(event))
 
     def _on_mouse_drag(self, event):
-        self.selection_box.set_end(event.x, event.y)
+        if self.hover_block:
+            self.hover_block = None
+            self.canvas.delete("hover_block")
+        x, y = self._canvas_point(event)
+        # 拖出窗口时限制在覆盖窗口内，选区不会超出 selection_photo
+        self.selection_box.set_end(min(max(x, 0), self.logical_size[0]), min(max(y, 0), self.logical_size[1]))
         box = self.selection_box.get_box()
-        if box:
-            self.canvas.delete("selection_area")
-            bright_crop = self.full_screen_image.crop(box)
-            self.selection_photo = ImageTk.PhotoImage(bright_crop)
-            self.canvas.create_image(box[0], box[1], image=self.selection_photo, anchor=tk.NW, tags="selection_area")
-            self.canvas.create_rectangle(box, outline='green', width=2, tags="selection_area")
+        if box and box[2] > box[0] and box[3] > box[1]:
+            size = (box[2] - box[0], box[3] - box[1])
+            bright_crop = self.full_screen_image.crop(self.monitor.to_physical(box, self.logical_size))
+            if bright_crop.size != size:
+                bright_crop = bright_crop.resize(size)
+            self._show_selection(box, bright_crop)
+            if self.owner.speculator:
+                # 拖动停顿 pause_ms 后提前识别当前选区，每次移动都重新计时
+                self._cancel_speculation()
+                self.speculate_after_id = self.win.after(self.owner.speculator.pause_ms, self._speculate)
 
-    def _on_mouse_release(self, event):
-        box_coords = self.selection_box.get_box()
-        if box_coords and (box_coords[2] - box_coords[0] > 5) and (box_coords[3] - box_coords[1] > 5):
-            self.captured_image = self.full_screen_image.crop(box_coords)
-            print(f'截图坐标: {box_coords}')
+    def _show_selection(self, box, bright_crop):
+        """在选区位置显示原亮度的截图
+
+        拖动时不再为每次移动创建 PhotoImage：selection_photo 只分配一次，每次把选区粘贴到它的左上角，
+        再把与选区同样大小的 selection_view 移到选区位置，只露出这一部分；绿色边框是 selection_view 的高亮边框。
+        """
+        border = SELECTION_BORDER
+        if self.selection_photo is None:
+            width, height = self.logical_size
+            self.selection_photo = ImageTk.PhotoImage("RGB", self.logical_size, width=width, height=height)
+            self.selection_view = tk.Canvas(self.canvas, cursor='tcross', bd=0, highlightthickness=border,
+                                            highlightbackground='green', highlightcolor='green')
+            # 画布坐标原点在边框外侧，图像从边框内侧开始
+            self.selection_view.create_image(border, border, image=self.selection_photo, anchor=tk.NW)
+        self.selection_photo.paste(bright_crop)
+        x, y = box[0] - border, box[1] - border
+        size = {"width": bright_crop.width + 2 * border, "height": bright_crop.height + 2 * border}
+        if self.selection_item is None:
+            self.selection_item = self.canvas.create_window(x, y, window=self.selection_view, anchor=tk.NW,
+                                                            tags="selection_area", **size)
         else:
-            self.captured_image = None
+            self.canvas.coords(self.selection_item, x, y)
+            self.canvas.itemconfigure(self.selection_item, **size)
+
+    def _hide_selection(self, release=False):
+        """隐藏选区；release=True 时同时释放 selection_photo，下次拖动时重新分配"""
+        self.canvas.delete("selection_area")
+        self.selection_item = None
+        if release and self.selection_view is not None:
+            self.selection_view.destroy()
+            self.selection_view = None
+            self.selection_photo = None
+
+    def _cancel_speculation(self):
+        if self.speculate_after_id is not None:
+            self.win.after_cancel(self.speculate_after_id)
+            self.speculate_after_id = None
+
+    def _speculate(self):
+        self.speculate_after_id = None
+        box = self.selection_box.get_box()
+        if box and (box[2] - box[0] > 5) and (box[3] - box[1] > 5):
+            physical_box = self.monitor.to_physical(box, self.logical_size)
+            self.owner.speculator.speculate(self.owner._global_box(self.monitor, physical_box),
+                                            self.full_screen_image.crop(physical_box))
+
+    def _on_mouse_release(self, event):
+        self._cancel_speculation()
+        box = self.selection_box.get_box()
+        if not box or (box[2] - box[0] <= 5 and box[3] - box[1] <= 5):
+            # 单击（几乎没有拖动）时选取鼠标下方的文字块
+            block = block_at(self.text_blocks or [], *self._canvas_point(event))
+            if block:
+                box = block
+        keep_selecting = bool(event.state & CONTROL_MASK)
+        if box and (box[2] - box[0] > 5) and (box[3] - box[1] > 5):
+            physical_box = self.monitor.to_physical(box, self.logical_size)
+            print(f'截图坐标: {physical_box} @ {self.monitor}')
+            crop = self.full_screen_image.crop(physical_box)
+            self.owner._add_region(self.monitor, physical_box, crop)
+            if keep_selecting:
+                # 按住 Ctrl 松开鼠标：保留该选区并继续框选，松开时不带 Ctrl 或按回车结束
+                self._mark_region(box, crop, len(self.owner.regions))
+                return
+        elif keep_selecting:
+            return
+        self.owner._finish()
+
+    def _mark_region(self, box, crop, number):
+        """把已确认的选区固定显示在遮罩上，并标注序号
+
+        释放 selection_photo，接着在其他显示器上框选时，各覆盖窗口的 selection_photo 不会同时存在。
+        """
+        self._hide_selection(release=True)
+        self.selection_box = _Box()
+        size = (box[2] - box[0], box[3] - box[1])
+        photo = ImageTk.PhotoImage(crop if crop.size == size else crop.resize(size))
+        self.region_photos.append(photo)
+        self.canvas.create_image(box[0], box[1], image=photo, anchor=tk.NW, tags="region")
+        self.canvas.create_rectangle(box, outline='#ffb000', width=2, tags="region")
+        self.canvas.create_text(box[0] + 4, box[1] + 4, text=str(number), anchor=tk.NW,
+                                fill='#ffb000', font=("", 12, "bold"), tags="region")
 
-        self.destroy()  # 使用新的公共方法
+
+class Screenshotter:
+    def __init__(self, master, backend=None, mode=CAPTURE_MODE_CURSOR,
+                 memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, tracer=None, click_select=False,
+                 region_order=REGION_ORDER_SELECTION, speculator=None):
+        self.master = master
+        self.click_select = click_select
+        self.region_order = region_order
+        self.speculator = speculator  # ocr_client.SpeculativeOcr，拖动停顿时提前识别
+        self.backend = backend or PilCaptureBackend(master)
+        self.tracer = tracer or MemoryTracer()
+        self.regions = []  # [(全局物理坐标框, 截图)]，按框选顺序
+
+        self.tracer.start()
+        self.overlays = []
+        for monitor, image in grab_monitors(self.backend, mode, memory_budget_mb, self.tracer):
+            with metrics.timer("stage.overlay"):
+                self.overlays.append(_MonitorOverlay(self, monitor, image))
+            self.tracer.snapshot("overlay")
+        self.win = self.overlays[0].win
+
+    def destroy(self):
+        """提供一个公共接口来销毁所有覆盖窗口"""
+        for overlay in self.overlays:
+            overlay.destroy()
+
+    def _on_cancel(self, event=None):
+        self.regions = []
+        if self.speculator:
+            self.speculator.close()
+        self.destroy()
+
+    @staticmethod
+    def _global_box(monitor, physical_box):
+        """把显示器内的物理坐标框换算为虚拟桌面上的全局物理坐标"""
+        left, top, right, bottom = physical_box
+        return (monitor.x + left, monitor.y + top, monitor.x + right, monitor.y + bottom)
+
+    def _add_region(self, monitor, physical_box, image):
+        self.regions.append((self._global_box(monitor, physical_box), image))
+
+    def _finish(self):
+        self.tracer.snapshot("crop")
+        self.destroy()
+
+    def captured_regions(self):
+        """按 region_order 排列的选区 [(全局物理坐标框, 截图)]"""
+        if self.region_order == REGION_ORDER_READING:
+            return sorted(self.regions, key=lambda region: (region[0][1], region[0][0]))
+        return list(self.regions)
 
     def capture(self):
-        """主入口：显示窗口并等待其关闭，然后返回截图结果"""
+        """主入口：显示窗口并等待其关闭，然后返回选区列表 [(全局物理坐标框, 截图)]；取消时为空列表"""
         self.win.focus_force()
         self.win.wait_window(self.win)
-        return self.captured_image
-
+        self.overlays = []
+        self.tracer.snapshot("destroy")
+        self.tracer.report()
+        self.tracer.stop()
+        return self.captured_regions()
@@ -0,0 +1,225 @@
+"""截图会话的录制与回放
+
+录制：每次截图的裁剪图、相对时间、OCR 结果和耗时写入一个 zip 归档，
+每条记录对应 NNNNNN.png 和 NNNNNN.json 两个文件，逐条追加，进程中途退出也不会丢失已录制内容。
+每次启动程序是一个会话（session），offset 为相对本会话第一次截图的秒数。
+
+回放: python session_trace.py trace.zip --engine-path <WeChatOCR.exe> --lib-path <目录> [--config config.json] [--max-rate]
+      python session_trace.py trace.zip --backend fake [--max-rate]
+"""
+import argparse
+import difflib
+import io
+import json
+import logging
+import threading
+import time
+import zipfile
+
+from PIL import Image
+
+
+class TraceRecorder:
+    """将截图会话追加写入 zip 归档"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._start = None
+        self._index = 0
+        self._session = 0
+        # 继续在已有归档后追加时，从已有记录数开始编号，并开始一个新的会话
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = sorted(name for name in archive.namelist() if name.endswith(".json"))
+                if names:
+                    self._index = len(names)
+                    self._session = json.loads(archive.read(names[-1])).get("session", 0) + 1
+        except (FileNotFoundError, zipfile.BadZipFile):
+            pass
+
+    def record(self, image, captured_at, text, latency, speculative=None):
+        """记录一次截图；captured_at 为 time.monotonic() 时间戳，latency 为 OCR 耗时（秒）
+
+        speculative 表示是否命中了拖动中的推测识别，未开启推测识别时为 None。
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        with self._lock:
+            if self._start is None:
+                self._start = captured_at
+            meta = {
+                "index": self._index,
+                "session": self._session,
+                "offset": round(captured_at - self._start, 4),
+                "width": image.width,
+                "height": image.height,
+                "text": text,
+                "latency": None if latency is None else round(latency, 4),
+                "speculative": speculative,
+            }
+            name = f"{self._index:06d}"
+            try:
+                with zipfile.ZipFile(self.path, "a", compression=zipfile.ZIP_STORED) as archive:
+                    archive.writestr(f"{name}.png", buffer.getvalue())
+                    archive.writestr(f"{name}.json", json.dumps(meta, ensure_ascii=False))
+                self._index += 1
+            except OSError as e:
+                logging.error(f"写入会话录制文件失败: {e}")
+
+
+class TraceReplayer:
+    """按原始节奏或最大速率把录制的截图重新送入 OCR"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def entries(self):
+        """按录制顺序返回 (meta, image)"""
+        with zipfile.ZipFile(self.path) as archive:
+            names = sorted(name[:-5] for name in archive.namelist() if name.endswith(".json"))
+            for name in names:
+                meta = json.loads(archive.read(f"{name}.json"))
+                image = Image.open(io.BytesIO(archive.read(f"{name}.png")))
+                image.load()
+                yield meta, image
+
+    def replay(self, ocr_func, paced=True, compare=True):
+        """ocr_func(image) -> text；返回包含延迟、吞吐和结果比对的报告字典
+
+        paced=True 时按录制时的到达间隔提交，每个会话单独计时，紧接着上一个会话开始；前一个任务未完成时顺延。
+        compare=False 时不比对结果文本（例如回放到伪引擎）。
+        """
+        latencies, mismatches = [], []
+        recorded = {True: [], False: []}  # 录制时命中/未命中推测识别的耗时
+        start = time.monotonic()
+        session, base, last_offset = None, start, 0.0
+        for meta, image in self.entries():
+            if meta.get("speculative") is not None and meta.get("latency") is not None:
+                recorded[meta["speculative"]].append(meta["latency"])
+            if paced:
+                # 没有 session 字段的旧归档中，offset 变小即为新会话
+                if meta.get("session") != session or meta["offset"] < last_offset:
+                    session, base = meta.get("session"), time.monotonic() - meta["offset"]
+                last_offset = meta["offset"]
+                delay = base + meta["offset"] - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            task_start = time.perf_counter()
+            text = ocr_func(image)
+            latencies.append(time.perf_counter() - task_start)
+            expected = meta.get("text")
+            if compare and expected is not None and (text or "") != expected:
+                ratio = difflib.SequenceMatcher(None, expected, text or "").ratio()
+                mismatches.append({"index": meta["index"], "similarity": round(ratio, 3),
+                                   "expected": expected, "actual": text})
+        elapsed = time.monotonic() - start
+        latencies.sort()
+        count = len(latencies)
+        return {
+            "count": count,
+            "elapsed": elapsed,
+            "throughput": count / elapsed if elapsed else 0.0,
+            "p50": latencies[count // 2] if count else None,
+            "p95": latencies[min(count - 1, int(count * 0.95))] if count else None,
+            "max": latencies[-1] if count else None,
+            "mismatches": mismatches,
+            "speculative": {
+                "hits": len(recorded[True]),
+                "misses": len(recorded[False]),
+                "hit_p50": _median(recorded[True]),
+                "miss_p50": _median(recorded[False]),
+            },
+        }
+
+
+def _median(values):
+    return sorted(values)[len(values) // 2] if values else None
+
+
+def format_report(report):
+    lines = [f"tasks={report['count']} elapsed={report['elapsed']:.2f}s "
+             f"throughput={report['throughput']:.2f}/s"]
+    if report["count"]:
+        lines.append(f"latency p50={report['p50'] * 1000:.0f}ms p95={report['p95'] * 1000:.0f}ms "
+                     f"max={report['max'] * 1000:.0f}ms")
+    speculative = report.get("speculative")
+    if speculative and (speculative["hits"] or speculative["misses"]):
+        hit_p50, miss_p50 = speculative["hit_p50"], speculative["miss_p50"]
+        lines.append(f"recorded speculative hits={speculative['hits']} misses={speculative['misses']} "
+                     f"latency p50 hit={'-' if hit_p50 is None else f'{hit_p50 * 1000:.0f}ms'} "
+                     f"miss={'-' if miss_p50 is None else f'{miss_p50 * 1000:.0f}ms'}")
+    lines.append(f"mismatches={len(report['mismatches'])}")
+    for item in report["mismatches"]:
+        lines.append(f"  #{item['index']} similarity={item['similarity']}")
+    return "\n".join(lines)
+
+
+def load_pipeline_options(config_path):
+    """按程序的配置文件构建 (PreprocessOptions, TextPostprocessor 或 None)，与录制时的识别流程一致
+
+    配置文件不存在时使用与程序相同的默认值。
+    """
+    from postprocess import PostprocessOptions, TextPostprocessor
+    from preprocess import PreprocessOptions
+
+    config = {}
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        logging.warning(f"配置文件 {config_path} 不存在，使用默认的预处理和后处理选项。")
+    except json.JSONDecodeError as e:
+        raise SystemExit(f"无法解析配置文件 {config_path}: {e}")
+    postprocess = PostprocessOptions.from_config(config)
+    return (PreprocessOptions.from_config(config),
+            TextPostprocessor(postprocess) if postprocess.enabled() else None)
+
+
+def _fake_engine_factory(latency, latency_per_mpx):
+    from ocr_engine import FakeEngine
+
+    def factory(exe_path, lib_dir, on_connect_change):
+        return FakeEngine(lib_dir, on_connect_change, latency=latency, latency_per_mpx=latency_per_mpx)
+    return factory
+
+
+def main():
+    from ocr_client import OcrClient
+    from ocr_engine import EngineSupervisor
+
+    parser = argparse.ArgumentParser(description="回放录制的截图会话")
+    parser.add_argument("trace", help="录制的 zip 归档")
+    parser.add_argument("--backend", choices=("wechat", "fake"), default="wechat",
+                        help="wechat: 微信 OCR 引擎；fake: 伪引擎，只测量流程开销，不比对结果文本")
+    parser.add_argument("--engine-path", help="OCR 引擎可执行文件路径（wechat 后端必填）")
+    parser.add_argument("--lib-path", help="引擎依赖库目录（wechat 后端必填）")
+    parser.add_argument("--fake-latency", type=float, default=0.05, help="伪引擎每个任务的固定耗时（秒）")
+    parser.add_argument("--fake-latency-per-mpx", type=float, default=0.05, help="伪引擎每百万像素增加的耗时（秒）")
+    parser.add_argument("--config", default="config.json",
+                        help="录制时程序使用的配置文件，回放使用其中相同的预处理和后处理选项")
+    parser.add_argument("--max-rate", action="store_true", help="忽略原始节奏，以最大速率回放")
+    args = parser.parse_args()
+    fake = args.backend == "fake"
+    if not fake and not (args.engine_path and args.lib_path):
+        parser.error("wechat 后端需要 --engine-path 和 --lib-path")
+
+    logging.basicConfig(level=logging.INFO)
+    preprocess, postprocess = load_pipeline_options(args.config)
+    supervisor = EngineSupervisor(_fake_engine_factory(args.fake_latency, args.fake_latency_per_mpx)) if fake else None
+    client = OcrClient(args.engine_path, args.lib_path, preprocess=preprocess, postprocess=postprocess,
+                       supervisor=supervisor)
+    if not client.start():
+        raise SystemExit("无法启动OCR引擎")
+    try:
+        report = TraceReplayer(args.trace).replay(lambda image: client.ocr(image).text, paced=not args.max_rate,
+                                                  compare=not fake)
+    finally:
+        client.close()
+    print(format_report(report))
+    if report["mismatches"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,10 +7,11 @@ import threading
 import logging
 
 class SettingsPage(ttk.Frame):
-    def __init__(self, master, config_path, logger, on_save_callback=None, *args, **kwargs):
+    def __init__(self, master, config_path, logger, on_save_callback=None, on_profile_callback=None, *args, **kwargs):
         super().__init__(master, *args, **kwargs)
         self.config_path = config_path
         self.on_save_callback = on_save_callback
+        self.on_profile_callback = on_profile_callback
         self.logger = logger
 
         # --- 加载当前配置 ---
@@ -21,13 +22,22 @@ class SettingsPage(ttk.Frame):
         self.engine_lib_path_var = tk.StringVar(value=self.config.get("engine_lib_path", ""))
         self.hotkey_var = tk.StringVar(value=self.config.get("hotkey", "ctrl+alt+a"))
         self.delay_var = tk.StringVar(value=self.config.get("screenshot_delay", 0.1))
+        self.capture_all_var = tk.BooleanVar(value=self.config.get("capture_mode") == "all")
+        self.click_select_var = tk.BooleanVar(value=self.config.get("click_select", True))
+        self.reading_order_var = tk.BooleanVar(value=self.config.get("region_order") == "reading")
+        self.speculative_var = tk.BooleanVar(value=self.config.get("speculative_ocr", False))
         self.verbose_log_var = tk.BooleanVar(value=self.config.get("verbose_log", False))
+        # 性能剖析开关只在本次运行中生效，不写入配置
+        self.profile_var = tk.BooleanVar(value=False)
+        self.profile_captures_var = tk.StringVar(value="5")
+        self.profile_seconds_var = tk.StringVar(value="60")
 
         # --- 构建界面 ---
         self._setup_ui()
 
         # --- 绑定事件 ---
         self.verbose_log_var.trace_add("write", self._on_verbose_log_change)
+        self.profile_check.config(command=self._on_profile_toggle)
 
     def _on_verbose_log_change(self, *args):
         """当'显示完整日志'复选框状态改变时调用，立即生效"""
@@ -35,6 +45,22 @@ class SettingsPage(ttk.Frame):
         if self.logger:
             self.logger.set_verbose(is_verbose)
 
+    def _on_profile_toggle(self):
+        """'记录性能剖析'复选框被点击时调用：勾选开始剖析，取消勾选提前结束"""
+        if not self.on_profile_callback:
+            return
+        if not self.profile_var.get():
+            self.on_profile_callback(False, None, None)
+            return
+        try:
+            captures = int(self.profile_captures_var.get() or 0) or None
+            seconds = float(self.profile_seconds_var.get() or 0) or None
+        except ValueError:
+            messagebox.showwarning("输入错误", "截图次数和时长必须是数字！", parent=self)
+            self.profile_var.set(False)
+            return
+        self.on_profile_callback(True, captures, seconds)
+
     def _load_config(self):
         try:
             with open(self.config_path, 'r', encoding='utf-8') as f:
@@ -63,14 +89,34 @@ class SettingsPage(ttk.Frame):
         ttk.Label(self, text="截图延迟(秒):").grid(row=6, column=0, sticky="w", pady=5)
         delay_entry = ttk.Entry(self, textvariable=self.delay_var, width=20)
         delay_entry.grid(row=7, column=0, sticky="w")
+        speculative_check = ttk.Checkbutton(self, text="拖动停顿时提前识别", variable=self.speculative_var)
+        speculative_check.grid(row=7, column=1, sticky="w")
+
+        # --- 多显示器 ---
+        capture_all_check = ttk.Checkbutton(self, text="截取所有显示器 (默认仅截取鼠标所在显示器)", variable=self.capture_all_var)
+        capture_all_check.grid(row=8, column=0, sticky="w", pady=(10, 0))
+        click_select_check = ttk.Checkbutton(self, text="单击选取文字块", variable=self.click_select_var)
+        click_select_check.grid(row=8, column=1, sticky="w", pady=(10, 0))
 
         # --- 日志级别 ---
         log_check = ttk.Checkbutton(self, text="显示完整日志 (用于调试)", variable=self.verbose_log_var)
-        log_check.grid(row=8, column=0, columnspan=2, sticky="w", pady=(10, 0))
+        log_check.grid(row=9, column=0, sticky="w")
+        reading_order_check = ttk.Checkbutton(self, text="多选区按阅读顺序合并", variable=self.reading_order_var)
+        reading_order_check.grid(row=9, column=1, sticky="w")
+
+        # --- 性能剖析 ---
+        profile_frame = ttk.Frame(self)
+        profile_frame.grid(row=10, column=0, columnspan=2, sticky="w")
+        self.profile_check = ttk.Checkbutton(profile_frame, text="记录性能剖析: 接下来", variable=self.profile_var)
+        self.profile_check.pack(side="left")
+        ttk.Entry(profile_frame, textvariable=self.profile_captures_var, width=4).pack(side="left")
+        ttk.Label(profile_frame, text="次截图或").pack(side="left")
+        ttk.Entry(profile_frame, textvariable=self.profile_seconds_var, width=4).pack(side="left")
+        ttk.Label(profile_frame, text="秒内").pack(side="left")
 
         # --- 按钮区域 ---
         button_frame = ttk.Frame(self)
-        button_frame.grid(row=9, column=0, columnspan=2, pady=(20, 0), sticky="e")
+        button_frame.grid(row=11, column=0, columnspan=2, pady=(20, 0), sticky="e")
 
         self.detect_button = ttk.Button(button_frame, text="自动检测路径", command=self._auto_detect_paths_thread)
         self.detect_button.pack(side="left", padx=10)
@@ -192,13 +238,19 @@ class SettingsPage(ttk.Frame):
             messagebox.showwarning("输入错误", "截图延迟必须是一个数字！", parent=self)
             return
 
-        new_config = {
+        # 保留配置文件中未在界面上展示的其他项
+        new_config = self._load_config()
+        new_config.update({
             "ocr_engine_path": self.ocr_exe_path_var.get().strip(),
             "engine_lib_path": self.engine_lib_path_var.get().strip(),
             "hotkey": self.hotkey_var.get().strip().lower(),
             "screenshot_delay": delay,
+            "capture_mode": "all" if self.capture_all_var.get() else "cursor",
+            "click_select": self.click_select_var.get(),
+            "region_order": "reading" if self.reading_order_var.get() else "selection",
+            "speculative_ocr": self.speculative_var.get(),
             "verbose_log": self.verbose_log_var.get()
-        }
+        })
 
         # 验证必填字段
         if not new_config["ocr_engine_path"] or not new_config["engine_lib_path"] or not new_config["hotkey"]:
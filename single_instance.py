@@ -0,0 +1,150 @@
+import getpass
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+    import fcntl
+
+APP_ID = "Ocr2Clip"
+AUTHKEY = b"Ocr2Clip-ipc"
+
+
+def default_address(app_id=APP_ID):
+    """每个用户一个 IPC 地址：Windows 上为命名管道，其他平台为 Unix 套接字"""
+    user = getpass.getuser()
+    if sys.platform == "win32":
+        return rf"\\.\pipe\{app_id}-{user}"
+    return os.path.join(tempfile.gettempdir(), f"{app_id}-{user}.sock")
+
+
+def default_lock_path(app_id=APP_ID):
+    return os.path.join(tempfile.gettempdir(), f"{app_id}-{getpass.getuser()}.lock")
+
+
+class InstanceLock:
+    """基于文件锁的进程互斥，进程退出（包括崩溃）时由操作系统自动释放"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def acquire(self):
+        """非阻塞地获取锁，成功返回 True"""
+        f = open(self.path, "a+")
+        try:
+            if msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._file = f
+        return True
+
+    def release(self):
+        if not self._file:
+            return
+        try:
+            if msvcrt:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except OSError:
+            pass
+        self._file.close()
+        self._file = None
+
+
+class SingleInstance:
+    """单实例检测与命令转发
+
+    第一个实例持有文件锁并在 IPC 地址上监听命令；之后启动的实例拿不到锁，
+    把自己的命令（如 ("capture", []) / ("ocr", [文件...]) / ("show", []) / ("profile", [秒数, 截图次数])）
+    转发给第一个实例后退出。
+    """
+
+    def __init__(self, address=None, lock_path=None, authkey=AUTHKEY):
+        self.address = address or default_address()
+        self.authkey = authkey
+        self.lock = InstanceLock(lock_path or default_lock_path())
+        self._listener = None
+        self._thread = None
+        self._closing = False
+
+    def acquire(self):
+        """尝试成为主实例"""
+        return self.lock.acquire()
+
+    def forward(self, command, args=(), timeout=5.0):
+        """把命令发送给主实例；主实例可能仍在启动，监听未就绪时在 timeout 内重试"""
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                with Client(self.address, authkey=self.authkey) as conn:
+                    conn.send((command, list(args)))
+                    return conn.recv() == "ok"
+            except (OSError, EOFError) as e:
+                if time.monotonic() >= deadline:
+                    logging.error(f"无法连接到正在运行的实例: {e}")
+                    return False
+                time.sleep(0.1)
+
+    def serve(self, handler):
+        """在后台线程中接收其他实例转发的命令，handler(command, args) 在该线程中调用"""
+        if sys.platform != "win32" and os.path.exists(self.address):
+            # 持有锁说明之前的实例已退出，遗留的套接字文件可以删除
+            os.remove(self.address)
+        self._listener = Listener(self.address, authkey=self.authkey)
+        self._thread = threading.Thread(target=self._run, args=(handler,), daemon=True)
+        self._thread.start()
+
+    def _run(self, handler):
+        while not self._closing:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError) as e:
+                if self._closing:
+                    break
+                logging.warning(f"接收实例命令失败: {e}")
+                continue
+            with conn:
+                try:
+                    command, args = conn.recv()
+                except (OSError, EOFError, ValueError, TypeError):
+                    continue
+                if self._closing:
+                    break
+                logging.info(f"收到其他实例转发的命令: {command} {args}")
+                try:
+                    handler(command, args)
+                    conn.send("ok")
+                except Exception as e:
+                    logging.error(f"处理实例命令失败: {e}", exc_info=True)
+                    conn.send("error")
+
+    def close(self):
+        """停止监听并释放锁"""
+        if self._listener:
+            self._closing = True
+            # 连接自己一次，唤醒阻塞在 accept 上的线程
+            try:
+                with Client(self.address, authkey=self.authkey) as conn:
+                    conn.send(("noop", []))
+            except (OSError, EOFError):
+                pass
+            self._listener.close()
+            if self._thread:
+                self._thread.join(timeout=2)
+            self._listener = None
+        self.lock.release()